@@ -0,0 +1,82 @@
+"""Microbenchmark: rendering a list endpoint response the default FastAPI way
+(jsonable_encoder + JSONResponse) versus the orjson render used by FastJSONResponse.
+
+    python bench_json_response.py [--leads 500] [--seconds 3]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def sample_leads(count: int):
+    """Lead documents shaped like GET /api/leads returns them from Mongo"""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "business_name": f"Elite Dental Clinic #{i}",
+            "address": "123 Main St, New York, NY",
+            "website": "https://elitedental.com",
+            "email": "info@elitedental.com",
+            "phone": "+1-212-555-0101",
+            "rating": 4.8,
+            "review_count": 234,
+            "gmb_link": f"https://g.page/elite-dental-{i}",
+            "source": "Google Maps",
+            "status": "New",
+            "notes": None,
+            "tags": ["dentist", "nyc"],
+            "job_id": str(uuid.uuid4()),
+            "fingerprint": uuid.uuid4().hex,
+            "created_at": now - timedelta(minutes=i),
+            "last_activity": now,
+        }
+        for i in range(count)
+    ]
+
+
+def default_render(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def orjson_render(content):
+    # Same as server.FastJSONResponse.render, without importing the app
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def measure(render, content, seconds: float) -> float:
+    render(content)  # warm up
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        render(content)
+        runs += 1
+    return runs / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--leads", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    content = {"leads": sample_leads(args.leads), "total": args.leads, "next_cursor": None}
+    assert json.loads(default_render(content)) == json.loads(orjson_render(content))
+
+    baseline = measure(default_render, content, args.seconds)
+    fast = measure(orjson_render, content, args.seconds)
+    print(f"{args.leads} leads per response")
+    print(f"jsonable_encoder + JSONResponse: {baseline:8.1f} responses/s")
+    print(f"FastJSONResponse (orjson):       {fast:8.1f} responses/s")
+    print(f"speedup: {fast / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, RedirectResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, ReplaceOne, DeleteOne
+from pymongo.errors import OperationFailure, BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 import uuid
+from urllib.parse import urlencode, urlsplit
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 import bcrypt
+import orjson
+import brotli
+import gzip
 import jwt
 import asyncio
 import random
+import socket
+from concurrent.futures import ThreadPoolExecutor
+import re
+import time
+import json
+import base64
+import hashlib
+import hmac
+import html
+import csv
+import io
+import codecs
 from emergentintegrations.llm.chat import LlmChat, UserMessage
+from openai import AsyncOpenAI
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 # JWT config
@@ -31,20 +52,151 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'default_secret_key')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DAYS = 30
 
+# Lead list totals: total=cached reuses a count for this many seconds
+LEAD_COUNT_CACHE_TTL = 30
+LEAD_COUNT_CACHE_SIZE = 1000
+
+# Campaign sending engine
+SEND_CONCURRENCY = int(os.environ.get('SEND_CONCURRENCY', 8))  # default workers per campaign
+SEND_MAX_CONCURRENCY = 64
+SEND_DOMAIN_RATE_PER_MINUTE = int(os.environ.get('SEND_DOMAIN_RATE_PER_MINUTE', 60))  # per recipient domain
+SEND_DEFAULT_RATE_PER_MINUTE = 120  # used when a user has no active email account configured
+EMAIL_BOOKKEEPING_BATCH_SIZE = 100  # sent emails per bookkeeping flush
+EMAIL_BOOKKEEPING_FLUSH_INTERVAL = 1.0  # seconds
+
+# Open/click tracking
+TRACKING_BASE_URL = os.environ.get('TRACKING_BASE_URL', 'http://localhost:8000').rstrip('/')
+TRACKING_SECRET = os.environ.get('TRACKING_SECRET', JWT_SECRET)
+TRACKING_FLUSH_INTERVAL = 2.0  # seconds
+TRACKING_MAX_BUFFERED_EVENTS = 5000  # flush early once this many distinct events are waiting
+
+# AI follow-up responses are reused for identical (business, contact, tone) inputs
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 3600))  # seconds
+AI_CACHE_SIZE = 5000
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')  # openai (streams tokens), emergent, fake (deterministic, offline)
+OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o')
+AI_BATCH_CONCURRENCY = int(os.environ.get('AI_BATCH_CONCURRENCY', 4))
+AI_BATCH_MAX_LEADS = 5000
+AI_BATCH_MAX_ATTEMPTS = 3
+AI_BATCH_RETRY_BASE_DELAY = 1.0  # seconds, doubled on each retry
+
+# Background job queue
+JOB_WORKER_IN_PROCESS = os.environ.get('JOB_WORKER_IN_PROCESS', 'true').lower() == 'true'
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4))
+JOB_LEASE_SECONDS = 60
+JOB_HEARTBEAT_SECONDS = 20
+JOB_POLL_INTERVAL = 1.0  # seconds between claim attempts when the queue is empty
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 5.0  # seconds before a failed job is retried, doubled on each attempt
+JOB_RETRY_MAX_DELAY = 300.0
+
+# Admin access (comma-separated emails allowed to use /api/admin routes)
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+# Password hashing runs in a thread pool so bcrypt never blocks the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 200))  # waiting requests before 503
+
 # Security
 security = HTTPBearer()
 start_time = datetime.now(timezone.utc)
 VERSION = "v1.0"
 # Analytics caching
 ANALYTICS_CACHE_TTL = 60  # cache TTL in seconds
-analytics_cache = {
-    "summary": {"data": None, "timestamp": 0},
-    "sources": {"data": None, "timestamp": 0},
-    "engagement": {"data": None, "timestamp": 0},
-}
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 10000))  # entries across all users
+# Lead ingestion batching
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 100))
+INGEST_FLUSH_INTERVAL = float(os.environ.get('INGEST_FLUSH_INTERVAL', 1.0))  # seconds
+EXPORT_FLUSH_ROWS = 500  # Rows written to the response per chunk
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_MAX_RECORD_CHARS = 65536
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 1000))  # Leads per update_many/delete_many
+BULK_MAX_IDS = 50000
+# Response compression
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes; smaller bodies are sent as is
+# Scraper progress streaming
+PROGRESS_PUBLISH_INTERVAL = float(os.environ.get('PROGRESS_PUBLISH_INTERVAL', 0.25))  # min seconds between events
+PROGRESS_FALLBACK_POLL_SECONDS = 3  # re-read the job when no local events arrive (job runs in another process)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson, which serializes datetimes natively.
+
+    List endpoints return it directly so their Mongo documents skip jsonable_encoder
+    and are serialized in a single pass."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+class CompressionMiddleware:
+    """Compresses complete responses of at least minimum_size bytes with brotli or gzip,
+    whichever the client accepts (brotli preferred). Streamed responses such as SSE and
+    exports pass through untouched so every chunk is delivered as soon as it is written."""
+
+    COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
 
+    @staticmethod
+    def choose_encoding(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for item in accept_encoding.lower().split(','):
+            name, _, params = item.partition(';')
+            quality = params.strip()[2:] if params.strip().startswith('q=') else '1'
+            try:
+                if float(quality) > 0:
+                    accepted.add(name.strip())
+            except ValueError:
+                continue
+        for encoding in ("br", "gzip"):
+            if encoding in accepted:
+                return encoding
+        return None
 
-app = FastAPI()
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http":
+            encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            passthrough = True
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            compressible = (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(self.COMPRESSIBLE_TYPES)
+            )
+            if compressible:
+                body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # ============= MODELS =============
@@ -98,7 +250,7 @@ class ScrapingJob(BaseModel):
     progress: int = 0
     total_leads: int = 0
     scraped_leads: int = 0
-    results: List[str] = []  # Lead IDs
+    duplicate_leads: int = 0  # Scraped leads merged into an existing lead instead of inserted
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     completed_at: Optional[datetime] = None
 
@@ -116,6 +268,7 @@ class EmailCampaign(BaseModel):
     opened_count: int = 0
     clicked_count: int = 0
     replied_count: int = 0
+    skipped_count: int = 0  # Leads not sent to: deleted, without an email or not the user's
     follow_up_enabled: bool = True
     follow_up_delay_days: int = 3
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -146,6 +299,33 @@ class AIGenerateRequest(BaseModel):
     previous_email: Optional[str] = None
     tone: str = "Friendly"  # Friendly, Formal, Direct
 
+class AIBatchGenerateRequest(BaseModel):
+    lead_ids: List[str] = []
+    campaign_id: Optional[str] = None  # Personalise every lead in this draft campaign and store the results on it
+    lead_name: str = "Business Owner"
+    tone: str = "Friendly"
+    format: str = "ndjson"  # ndjson, sse
+
+class LeadFilter(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    status: Optional[str] = None
+    source: Optional[str] = None
+    search: Optional[str] = None
+    date_from: Optional[str] = Field(None, alias="from")
+    date_to: Optional[str] = Field(None, alias="to")
+
+class BulkLeadOperationRequest(BaseModel):
+    action: str  # set_status, set_notes, add_tags, remove_tags, delete
+    lead_ids: Optional[List[str]] = Field(None, max_length=BULK_MAX_IDS)
+    filter: Optional[LeadFilter] = None  # Same filters as GET /leads; used when lead_ids is omitted
+    status: Optional[str] = None
+    notes: Optional[str] = None
+    tags: List[str] = []
+
+class BatchGetLeadsRequest(BaseModel):
+    ids: List[str] = Field(..., max_length=500)
+    fields: Optional[List[str]] = None  # Projection; all fields when omitted
+
 class CreateCampaignRequest(BaseModel):
     name: str
     subject: str
@@ -153,6 +333,42 @@ class CreateCampaignRequest(BaseModel):
     lead_ids: List[str]
     follow_up_enabled: bool = True
     follow_up_delay_days: int = 3
+    concurrency: Optional[int] = Field(None, ge=1, le=SEND_MAX_CONCURRENCY)
+    start: bool = True  # False saves a draft, e.g. to personalise it with /ai/generate-batch first
+
+class StartCampaignRequest(BaseModel):
+    concurrency: Optional[int] = Field(None, ge=1, le=SEND_MAX_CONCURRENCY)
+
+class EmailAccount(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    email: EmailStr
+    type: str = "SMTP"  # SMTP, Gmail
+    sender_name: Optional[str] = None
+    status: str = "Active"  # Active, Inactive
+    is_primary: bool = False
+    daily_limit: int = 100
+    rate_per_minute: int = 20
+    smtp_config: Dict[str, Any] = {}  # host, port, username; passwords are never stored here
+    sent_today: int = 0
+    sent_date: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class EmailAccountRequest(BaseModel):
+    email: EmailStr
+    type: str = "SMTP"
+    sender_name: Optional[str] = None
+    daily_limit: int = Field(100, ge=1)
+    rate_per_minute: int = Field(20, ge=1)
+    smtp_config: Dict[str, Any] = {}
+
+class EmailAccountUpdate(BaseModel):
+    sender_name: Optional[str] = None
+    status: Optional[str] = None
+    is_primary: Optional[bool] = None
+    daily_limit: Optional[int] = Field(None, ge=1)
+    rate_per_minute: Optional[int] = Field(None, ge=1)
 
 # ============= MOCK DATA =============
 MOCK_LEADS_DATA = [
@@ -168,13 +384,501 @@ MOCK_LEADS_DATA = [
     {"business_name": "Quick Auto Repair", "address": "741 Auto St, Miami, FL", "website": "https://quickauto.com", "email": "service@quickauto.com", "phone": "+1-305-555-1010", "rating": 4.6, "review_count": 334, "gmb_link": "https://g.page/quick-auto", "source": "Google Maps"},
 ]
 
+# ============= LEAD SEARCH =============
+# Leads carry the words of their searchable fields (search_words) and every prefix of
+# those words (search_terms, multikey-indexed with user_id), so prefix search is an
+# index lookup instead of a regex scan.
+SEARCHABLE_LEAD_FIELDS = ("business_name", "email", "address", "phone", "tags")
+SEARCH_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+SEARCH_MIN_PREFIX = 2
+SEARCH_MAX_PREFIX = 15
+SEARCH_MAX_QUERY_TOKENS = 8
+SEARCH_BACKFILL_BATCH_SIZE = 500
+
+# Internal search fields are never returned by the API
+LEAD_PROJECTION = {"_id": 0, "search_terms": 0, "search_words": 0}
+
+def lead_search_fields(doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    words = set()
+    for field in ("business_name", "email", "address", "phone"):
+        value = doc.get(field)
+        if isinstance(value, str):
+            words.update(SEARCH_TOKEN_PATTERN.findall(value.lower()))
+    for tag in doc.get('tags') or []:
+        if isinstance(tag, str):
+            words.update(SEARCH_TOKEN_PATTERN.findall(tag.lower()))
+    phone = doc.get('phone')
+    if isinstance(phone, str):
+        digits = re.sub(r'\D', '', phone)
+        if digits:
+            words.add(digits)
+            words.add(digits[-10:])  # National number without the country code
+    terms = set()
+    for word in words:
+        for n in range(SEARCH_MIN_PREFIX, min(len(word), SEARCH_MAX_PREFIX) + 1):
+            terms.add(word[:n])
+    return {"search_words": sorted(words), "search_terms": sorted(terms)}
+
+def search_query_tokens(search: str) -> List[str]:
+    tokens = []
+    for token in SEARCH_TOKEN_PATTERN.findall(search.lower()):
+        token = token[:SEARCH_MAX_PREFIX]
+        if len(token) >= SEARCH_MIN_PREFIX and token not in tokens:
+            tokens.append(token)
+    return tokens[:SEARCH_MAX_QUERY_TOKENS]
+
+def search_score_stage(tokens: List[str]) -> Dict[str, Any]:
+    """Ranks matches by whole-word hits, with a bonus when the business name starts with the first token"""
+    return {"$addFields": {"search_score": {"$add": [
+        {"$multiply": [2, {"$size": {"$setIntersection": [{"$ifNull": ["$search_words", []]}, tokens]}}]},
+        {"$cond": [{"$eq": [{"$indexOfCP": [{"$toLower": "$business_name"}, tokens[0]]}, 0]}, 1, 0]},
+    ]}}}
+
+# ============= LEAD DEDUPLICATION =============
+# A lead's fingerprint identifies the business behind it: its phone digits, website host,
+# email and GMB link, or its name and address when it has none of those. A unique
+# (user_id, fingerprint) index lets ingest upsert on it, so finding a known business
+# again refreshes LEAD_MERGE_FIELDS on the existing lead instead of inserting a copy and
+# adds the new scraping job to its job_ids, so the lead shows up in that job's results.
+FINGERPRINT_FIELDS = ("phone", "website", "email", "gmb_link", "business_name", "address")
+LEAD_MERGE_FIELDS = ("rating", "review_count")
+
+def normalize_text(value: Any) -> str:
+    return ' '.join(SEARCH_TOKEN_PATTERN.findall(value.lower())) if isinstance(value, str) else ""
+
+def website_host(value: Any) -> str:
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    url = value.strip().lower()
+    host = urlsplit(url if '://' in url else f"//{url}").hostname or ""
+    return host[4:] if host.startswith('www.') else host
+
+def lead_fingerprint(doc: Dict[str, Any]) -> str:
+    phone = re.sub(r'\D', '', doc.get('phone') or '')[-10:]
+    email = (doc.get('email') or '').strip().lower()
+    gmb_link = (doc.get('gmb_link') or '').strip().lower().rstrip('/')
+    parts = [phone, website_host(doc.get('website')), email, gmb_link]
+    if not any(parts):
+        parts = [normalize_text(doc.get('business_name')), normalize_text(doc.get('address'))]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+def lead_upsert_op(doc: Dict[str, Any]) -> UpdateOne:
+    merged = {field: doc[field] for field in LEAD_MERGE_FIELDS if doc.get(field) is not None}
+    on_insert = {k: v for k, v in doc.items() if k not in merged and k not in ("user_id", "fingerprint")}
+    update = {"$setOnInsert": on_insert}
+    if merged:
+        update["$set"] = merged
+    if doc.get('job_id'):
+        del on_insert['job_ids']
+        update["$addToSet"] = {"job_ids": doc['job_id']}
+    return UpdateOne({"user_id": doc['user_id'], "fingerprint": doc['fingerprint']}, update, upsert=True)
+
+async def upsert_lead_docs(docs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Writes new leads, merging any whose fingerprint the user already has. Returns the
+    docs that were actually inserted and the number of duplicates merged."""
+    if not docs:
+        return [], 0
+    ops = [lead_upsert_op(doc) for doc in docs]
+    try:
+        upserted = (await db.leads.bulk_write(ops, ordered=False)).upserted_ids
+    except BulkWriteError as e:
+        upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+        errors = e.details.get('writeErrors', [])
+        if any(error['code'] != 11000 for error in errors):
+            raise
+        # Two upserts raced to insert the same fingerprint; run the losers again so they merge
+        await db.leads.bulk_write([ops[error['index']] for error in errors], ordered=False)
+    inserted = [docs[index] for index in sorted(upserted)]
+    return inserted, len(docs) - len(inserted)
+
+async def update_lead_fields(query: Dict[str, Any], updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Applies updates to one lead and returns the lead as it was before the update, or
+    None if nothing matched. Search fields and the fingerprint are recomputed if a field
+    they are built from changed."""
+    before = await db.leads.find_one_and_update(
+        query, {"$set": updates}, projection=LEAD_PROJECTION, return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None
+    derived = {}
+    if any(field in updates for field in SEARCHABLE_LEAD_FIELDS):
+        derived.update(lead_search_fields({**before, **updates}))
+    if any(field in updates for field in FINGERPRINT_FIELDS):
+        derived['fingerprint'] = lead_fingerprint({**before, **updates})
+    if derived:
+        try:
+            await db.leads.update_one({"id": before['id']}, {"$set": derived})
+        except DuplicateKeyError:
+            # The edit made this lead identical to another one; keep it, unfingerprinted
+            derived['fingerprint'] = None
+            await db.leads.update_one({"id": before['id']}, {"$set": derived})
+    return before
+
+async def backfill_lead_fingerprints():
+    """Fingerprints leads written before deduplication existed, in batches. Older leads
+    that duplicate an already fingerprinted one get a null fingerprint and are kept."""
+    updated = duplicates = 0
+    while True:
+        docs = await db.leads.find(
+            {"fingerprint": {"$exists": False}}, {"_id": 0, "id": 1, **{f: 1 for f in FINGERPRINT_FIELDS}}
+        ).sort("created_at", 1).limit(SEARCH_BACKFILL_BATCH_SIZE).to_list(SEARCH_BACKFILL_BATCH_SIZE)
+        if not docs:
+            break
+        try:
+            await db.leads.bulk_write(
+                [UpdateOne({"id": doc['id']}, {"$set": {"fingerprint": lead_fingerprint(doc)}}) for doc in docs],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            failed = [docs[error['index']]['id'] for error in e.details.get('writeErrors', []) if error['code'] == 11000]
+            if len(failed) != len(e.details.get('writeErrors', [])):
+                raise
+            await db.leads.update_many({"id": {"$in": failed}}, {"$set": {"fingerprint": None}})
+            duplicates += len(failed)
+        updated += len(docs)
+    if updated:
+        logging.info(f"Fingerprinted {updated} existing leads, {duplicates} of them duplicates of another lead")
+
+async def backfill_lead_job_ids():
+    """Gives leads written before job_ids existed the list holding their job_id"""
+    result = await db.leads.update_many(
+        {"job_ids": {"$exists": False}},
+        [{"$set": {"job_ids": {"$cond": [{"$ifNull": ["$job_id", False]}, ["$job_id"], []]}}}]
+    )
+    if result.modified_count:
+        logging.info(f"Added job_ids to {result.modified_count} existing leads")
+
+async def backfill_lead_search_fields():
+    """Adds search fields to leads written before search indexing existed, in batches"""
+    updated = 0
+    while True:
+        docs = await db.leads.find(
+            {"search_terms": {"$exists": False}}, {"_id": 0, "id": 1, **{f: 1 for f in SEARCHABLE_LEAD_FIELDS}}
+        ).limit(SEARCH_BACKFILL_BATCH_SIZE).to_list(SEARCH_BACKFILL_BATCH_SIZE)
+        if not docs:
+            break
+        await db.leads.bulk_write(
+            [UpdateOne({"id": doc['id']}, {"$set": lead_search_fields(doc)}) for doc in docs], ordered=False
+        )
+        updated += len(docs)
+    if updated:
+        logging.info(f"Backfilled search fields on {updated} leads")
+
+# ============= DATE HELPERS =============
+# Timestamps are stored as BSON dates (UTC). Documents written before that hold ISO
+# strings until migrate_dates, which runs in the background at startup, has converted
+# them; until then keyset pages and date-range filters skip those documents.
+def json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_date_bound(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """Parses a from/to query value: YYYY-MM-DD or an ISO datetime, UTC unless it has an
+    offset. A bare date used as the upper bound includes that whole day."""
+    if not value:
+        return None
+    try:
+        parsed = parse_timestamp(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(milliseconds=1)
+    return parsed
+
+def date_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    start, end = parse_date_bound(date_from), parse_date_bound(date_to, end=True)
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    return start, end
+
+def date_range_filter(field: str, start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lte"] = end
+    return {field: bounds} if bounds else {}
+
+# ============= PAGINATION HELPERS =============
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Encodes the (created_at, id) sort key of the last returned document as an opaque cursor"""
+    raw = json.dumps([doc['created_at'], doc['id']], separators=(',', ':'), default=json_default).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for relevance-ranked results, which have no stable keyset order"""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['offset']
+        return max(0, int(offset))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        return parse_timestamp(created_at), doc_id
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_filter(cursor: str, descending: bool = True) -> Dict[str, Any]:
+    """Builds the keyset filter for documents after the cursor position in (created_at, id) order"""
+    created_at, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: doc_id}},
+    ]}
+
+# ============= FIELD PROJECTION =============
+# List endpoints return a summary of each document by default; fields= picks the
+# columns instead and is pushed down into the Mongo projection.
+LEAD_FIELDS = (
+    "id", "business_name", "address", "website", "email", "phone", "rating", "review_count",
+    "gmb_link", "source", "status", "notes", "tags", "job_id", "created_at", "last_activity",
+)
+LEAD_SUMMARY_FIELDS = (
+    "id", "business_name", "address", "website", "email", "phone", "rating", "review_count",
+    "source", "status", "notes", "tags", "created_at", "last_activity",
+)
+CAMPAIGN_FIELDS = (
+    "id", "name", "subject", "body", "lead_ids", "status", "total_emails", "sent_count", "opened_count",
+    "clicked_count", "replied_count", "skipped_count", "follow_up_enabled", "follow_up_delay_days", "created_at", "completed_at",
+)
+CAMPAIGN_SUMMARY_FIELDS = (
+    "id", "name", "subject", "status", "total_emails", "sent_count", "opened_count",
+    "clicked_count", "replied_count", "skipped_count", "created_at", "completed_at",
+)
+
+def field_projection(fields: Optional[str], allowed: tuple, default: tuple, required: tuple = ("id",)) -> Dict[str, int]:
+    """Projection for a comma-separated fields= value, or for the default summary when omitted.
+    required fields (e.g. the cursor sort key) are always included."""
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(allowed)}"
+            )
+    else:
+        names = default
+    return {"_id": 0, **{name: 1 for name in (*required, *names)}}
+
+# ============= INDEXES =============
+# Every query is scoped by user_id and most sort on created_at; "id" is the public key.
+INDEX_SPECS = {
+    "users": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "email_unique", "keys": [("email", 1)], "unique": True},
+    ],
+    "leads": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1), ("id", -1)]},
+        {"name": "user_status_created", "keys": [("user_id", 1), ("status", 1), ("created_at", -1), ("id", -1)]},
+        {"name": "user_source", "keys": [("user_id", 1), ("source", 1), ("created_at", -1), ("id", -1)]},
+        {"name": "user_job_created", "keys": [("user_id", 1), ("job_ids", 1), ("created_at", 1), ("id", 1)]},
+        {"name": "user_search_terms", "keys": [("user_id", 1), ("search_terms", 1)]},
+        {"name": "user_id", "keys": [("user_id", 1), ("id", 1)]},
+        {"name": "user_fingerprint_unique", "keys": [("user_id", 1), ("fingerprint", 1)], "unique": True,
+         "partial": {"fingerprint": {"$type": "string"}}},
+    ],
+    "scraping_jobs": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)]},
+    ],
+    "campaigns": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)]},
+    ],
+    "email_logs": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "campaign_lead", "keys": [("campaign_id", 1), ("lead_id", 1)]},
+    ],
+    "email_accounts": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "user_created", "keys": [("user_id", 1), ("created_at", -1)]},
+    ],
+    "background_jobs": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+        {"name": "status_lease_created", "keys": [("status", 1), ("lease_expires_at", 1), ("created_at", 1)]},
+    ],
+    "lead_operations": [
+        {"name": "id_unique", "keys": [("id", 1)], "unique": True},
+    ],
+    "campaign_personalisations": [
+        {"name": "campaign_lead_unique", "keys": [("campaign_id", 1), ("lead_id", 1)], "unique": True},
+    ],
+    "analytics_rollups": [
+        {"name": "user_date_unique", "keys": [("user_id", 1), ("date", 1)], "unique": True},
+    ],
+}
+
+def index_matches(spec: Dict[str, Any], info: Dict[str, Any]) -> bool:
+    keys = [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in info['key']]
+    return (
+        keys == spec['keys']
+        and bool(info.get('unique', False)) == spec.get('unique', False)
+        and info.get('partialFilterExpression') == spec.get('partial')
+    )
+
+async def ensure_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """Creates missing indexes and rebuilds managed ones whose definition changed.
+
+    Indexes that are not in INDEX_SPECS are left alone. Failures (e.g. duplicate keys
+    blocking a unique index) are logged and reported instead of aborting startup."""
+    report = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        created, rebuilt, failed = [], [], []
+        for spec in specs:
+            info = existing.get(spec['name'])
+            if info is not None and index_matches(spec, info):
+                continue
+            if any(index_matches(spec, other) for other in existing.values()):
+                continue  # Same definition already present under another name
+            try:
+                if info is not None:
+                    await collection.drop_index(spec['name'])
+                    rebuilt.append(spec['name'])
+                else:
+                    created.append(spec['name'])
+                options = {"partialFilterExpression": spec['partial']} if 'partial' in spec else {}
+                await collection.create_index(
+                    spec['keys'], name=spec['name'], unique=spec.get('unique', False), **options
+                )
+            except OperationFailure as e:
+                logging.error(f"Index {collection_name}.{spec['name']} could not be built: {str(e)}")
+                failed.append(spec['name'])
+        report[collection_name] = {"created": created, "rebuilt": rebuilt, "failed": failed}
+    return report
+
+async def index_report() -> Dict[str, Dict[str, Any]]:
+    """Compares live indexes with INDEX_SPECS and lists indexes with no recorded use"""
+    report = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        usage = {stat['name']: stat['accesses'] for stat in stats}
+        missing = [
+            spec['name'] for spec in specs
+            if not any(index_matches(spec, info) for info in existing.values())
+        ]
+        managed = {
+            name for name, info in existing.items()
+            if any(index_matches(spec, info) for spec in specs)
+        }
+        report[collection_name] = {
+            "missing": missing,
+            "unmanaged": sorted(name for name in existing if name != "_id_" and name not in managed),
+            "unused": sorted(
+                name for name, accesses in usage.items()
+                if name != "_id_" and accesses.get('ops', 0) == 0
+            ),
+            "usage_since": {name: accesses.get('since') for name, accesses in usage.items()},
+        }
+    return report
+
 # ============= AUTH HELPERS =============
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<rounds>$<salt+hash>
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+class PasswordHasher:
+    """Runs bcrypt calls on a bounded thread pool.
+
+    At most `workers` hashes run at once; further calls wait their turn, and once
+    max_queue calls are waiting new ones are rejected with 503 instead of piling up."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.slots = asyncio.Semaphore(self.workers)
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please try again")
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - queued_at
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.active += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self.slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(verify_password, password, hashed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+password_hasher = PasswordHasher()
+# The event loop only keeps weak references to tasks, so running rehashes are held here
+password_upgrade_tasks: set = set()
+
+async def upgrade_password_hash(user_id: str, password: str, old_hash: str):
+    """Re-hashes a password at the configured cost after a successful login"""
+    try:
+        new_hash = await password_hasher.hash(password)
+    except HTTPException:
+        return  # Busy; try again on a later login
+    try:
+        await db.users.update_one({"id": user_id, "password_hash": old_hash}, {"$set": {"password_hash": new_hash}})
+    except Exception as e:
+        logging.error(f"Password hash upgrade for user {user_id} failed: {str(e)}")
+
+def schedule_password_upgrade(user_id: str, password: str, old_hash: str):
+    task = asyncio.create_task(upgrade_password_hash(user_id, password, old_hash))
+    password_upgrade_tasks.add(task)
+    task.add_done_callback(password_upgrade_tasks.discard)
+
 def create_token(user_id: str, email: str, remember_me: bool = False) -> str:
     expiration_days = JWT_EXPIRATION_DAYS if remember_me else 1
     expiration = datetime.now(timezone.utc) + timedelta(days=expiration_days)
@@ -191,6 +895,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user.get('email', '').lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 # ============= AUTH ROUTES =============
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
@@ -202,10 +911,9 @@ async def register(user_data: UserRegister):
     # Create user
     user = User(
         email=user_data.email,
-        password_hash=hash_password(user_data.password)
+        password_hash=await password_hasher.hash(user_data.password)
     )
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
     await db.users.insert_one(user_dict)
     
     token = create_token(user.id, user.email)
@@ -214,12 +922,462 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user_doc = await db.users.find_one({"email": credentials.email})
-    if not user_doc or not verify_password(credentials.password, user_doc['password_hash']):
+    if not user_doc or not await password_hasher.verify(credentials.password, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if password_needs_rehash(user_doc['password_hash']):
+        schedule_password_upgrade(user_doc['id'], credentials.password, user_doc['password_hash'])
     
     token = create_token(user_doc['id'], user_doc['email'], credentials.remember_me)
     return TokenResponse(token=token, email=user_doc['email'])
 
+# ============= ANALYTICS ROLLUPS =============
+# One analytics_rollups document per user per day. Lead counters (leads, sources.*,
+# statuses.*) live on the day the lead was created and always describe the leads that
+# still exist; email counters live on the day the email event happened and cover the
+# campaigns that still exist.
+ROLLUP_LEAD_FIELDS = {"_id": 0, "user_id": 1, "created_at": 1, "source": 1, "status": 1}
+ROLLUP_WRITE_BATCH = 1000  # rollup documents per bulk_write when rebuilding
+
+def rollup_day(timestamp: Any) -> str:
+    # Strings are ISO timestamps written before dates were stored natively
+    return timestamp.strftime('%Y-%m-%d') if isinstance(timestamp, datetime) else timestamp[:10]
+
+def day_expression(field: str) -> Dict[str, Any]:
+    """Aggregation expression giving the YYYY-MM-DD rollup day of a date (or legacy ISO string) field"""
+    return {"$cond": [
+        {"$eq": [{"$type": f"${field}"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}},
+        {"$substrCP": [f"${field}", 0, 10]},
+    ]}
+
+def rollup_key(value: Any) -> str:
+    # Counter names become document keys, which may not contain '.' or start with '$'
+    return str(value or "Unknown").replace('.', '_').lstrip('$') or "Unknown"
+
+def add_rollup_increments(increments: Dict[tuple, Dict[str, int]], user_id: str, day: str, **deltas: int):
+    fields = increments.setdefault((user_id, day), {})
+    for field, delta in deltas.items():
+        fields[field] = fields.get(field, 0) + delta
+
+def add_lead_rollup(increments: Dict[tuple, Dict[str, int]], lead: Dict[str, Any], sign: int = 1):
+    """Counts a created (sign=1) or deleted (sign=-1) lead"""
+    add_rollup_increments(increments, lead['user_id'], rollup_day(lead['created_at']), **{
+        "leads": sign,
+        f"sources.{rollup_key(lead.get('source'))}": sign,
+        f"statuses.{rollup_key(lead.get('status'))}": sign,
+    })
+
+def add_status_rollup(increments: Dict[tuple, Dict[str, int]], lead: Dict[str, Any], new_status: str):
+    """Moves a lead between status counters; lead is its state before the change"""
+    if lead.get('status') == new_status:
+        return
+    add_rollup_increments(increments, lead['user_id'], rollup_day(lead['created_at']), **{
+        f"statuses.{rollup_key(lead.get('status'))}": -1,
+        f"statuses.{rollup_key(new_status)}": 1,
+    })
+
+async def apply_rollup_increments(increments: Dict[tuple, Dict[str, int]]):
+    """Writes {(user_id, day): {field: delta}} as one upserting $inc per rollup document"""
+    ops = [
+        UpdateOne({"user_id": user_id, "date": day}, {"$inc": fields}, upsert=True)
+        for (user_id, day), fields in increments.items()
+        if any(fields.values())
+    ]
+    if ops:
+        await db.analytics_rollups.bulk_write(ops, ordered=False)
+
+def email_event_stages(user_id: Any) -> List[Dict[str, Any]]:
+    """Aggregation stages counting email log events per (user_id, day, rollup field).
+    Every event is counted on the day it happened, as the live increments do."""
+    return [
+        {"$project": {"user_id": user_id, "events": [
+            {"field": f"emails_{event}", "at": f"${event}_at"}
+            for event in ("sent", "opened", "clicked", "replied")
+        ]}},
+        {"$unwind": "$events"},
+        {"$match": {"events.at": {"$ne": None}}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": day_expression("events.at"), "field": "$events.field"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+async def remove_campaign_rollups(campaign_id: str, user_id: str):
+    """Takes a deleted campaign's email events off the rollups"""
+    increments = {}
+    async for row in db.email_logs.aggregate([
+        {"$match": {"campaign_id": campaign_id}},
+        *email_event_stages({"$literal": user_id}),
+    ]):
+        key = row['_id']
+        add_rollup_increments(increments, user_id, key['day'], **{key['field']: -row['count']})
+    await apply_rollup_increments(increments)
+
+async def rebuild_rollups(user_id: Optional[str] = None) -> int:
+    """Recomputes rollups from raw leads and email logs, for one user or everyone.
+
+    Each day document is replaced in place and only days that no longer have any data
+    are deleted, so readers never see half-built rollups. An increment applied between
+    the aggregation and the replace of its day is still lost, so run it when the
+    affected users are idle."""
+    lead_match = {"user_id": user_id} if user_id else {}
+    existing = {
+        (doc['user_id'], doc['date'])
+        async for doc in db.analytics_rollups.find(lead_match, {"_id": 0, "user_id": 1, "date": 1})
+    }
+    rollups: Dict[tuple, Dict[str, Any]] = {}
+    
+    lead_rows = db.leads.aggregate([
+        {"$match": lead_match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": day_expression("created_at"),
+                    "source": "$source", "status": "$status"},
+            "count": {"$sum": 1},
+        }},
+    ], allowDiskUse=True)
+    async for row in lead_rows:
+        key = row['_id']
+        doc = rollups.setdefault((key['user_id'], key['day']), {"sources": {}, "statuses": {}})
+        doc['leads'] = doc.get('leads', 0) + row['count']
+        for group, value in (("sources", key.get('source')), ("statuses", key.get('status'))):
+            name = rollup_key(value)
+            doc[group][name] = doc[group].get(name, 0) + row['count']
+    
+    # Logs of deleted campaigns drop out here, as delete_campaign takes them off the rollups
+    email_rows = db.email_logs.aggregate([
+        {"$lookup": {"from": "campaigns", "localField": "campaign_id", "foreignField": "id",
+                     "as": "campaign", "pipeline": [{"$project": {"_id": 0, "user_id": 1}}]}},
+        {"$unwind": "$campaign"},
+        {"$match": {"campaign.user_id": user_id} if user_id else {}},
+        *email_event_stages("$campaign.user_id"),
+    ], allowDiskUse=True)
+    async for row in email_rows:
+        key = row['_id']
+        doc = rollups.setdefault((key['user_id'], key['day']), {"sources": {}, "statuses": {}})
+        doc[key['field']] = row['count']
+    
+    ops = [
+        ReplaceOne({"user_id": u, "date": d}, {"user_id": u, "date": d, **fields}, upsert=True)
+        for (u, d), fields in rollups.items()
+    ]
+    ops += [DeleteOne({"user_id": u, "date": d}) for (u, d) in existing - rollups.keys()]
+    for start in range(0, len(ops), ROLLUP_WRITE_BATCH):
+        await db.analytics_rollups.bulk_write(ops[start:start + ROLLUP_WRITE_BATCH], ordered=False)
+    return len(rollups)
+
+async def rollup_stats(user_id: str, since: str, first_day: Optional[str] = None,
+                       last_day: Optional[str] = None) -> Dict[str, Any]:
+    """Totals plus per-day lead counts since the given YYYY-MM-DD date, read from rollups.
+    Totals are all-time unless first_day/last_day (inclusive) narrow them."""
+    match = {"user_id": user_id}
+    if first_day or last_day:
+        match["date"] = {**({"$gte": first_day} if first_day else {}), **({"$lte": last_day} if last_day else {})}
+    result = await db.analytics_rollups.aggregate([
+        {"$match": match},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "leads": {"$sum": "$leads"},
+                "emails_sent": {"$sum": "$emails_sent"},
+                "emails_opened": {"$sum": "$emails_opened"},
+                "emails_clicked": {"$sum": "$emails_clicked"},
+                "emails_replied": {"$sum": "$emails_replied"},
+            }}],
+            "by_date": [
+                {"$match": {"date": {"$gte": since}}},
+                {"$project": {"_id": 0, "date": 1, "leads": 1}},
+            ],
+            "by_source": [
+                {"$project": {"sources": {"$objectToArray": {"$ifNull": ["$sources", {}]}}}},
+                {"$unwind": "$sources"},
+                {"$group": {"_id": "$sources.k", "count": {"$sum": "$sources.v"}}},
+                {"$match": {"count": {"$gt": 0}}},
+                {"$sort": {"count": -1}},
+            ],
+        }},
+    ]).to_list(1)
+    facets = result[0] if result else {"totals": [], "by_date": [], "by_source": []}
+    totals = facets['totals'][0] if facets['totals'] else {}
+    sent = totals.get('emails_sent', 0)
+    return {
+        "total_leads": totals.get('leads', 0),
+        "emails_sent": sent,
+        "emails_opened": totals.get('emails_opened', 0),
+        "emails_clicked": totals.get('emails_clicked', 0),
+        "emails_replied": totals.get('emails_replied', 0),
+        "open_rate": round(totals.get('emails_opened', 0) / sent * 100, 1) if sent > 0 else 0,
+        "reply_rate": round(totals.get('emails_replied', 0) / sent * 100, 1) if sent > 0 else 0,
+        "by_date": {row['date']: row.get('leads', 0) for row in facets['by_date']},
+        "by_source": [{"name": row['_id'], "value": row['count']} for row in facets['by_source']],
+    }
+
+async def bootstrap_rollups():
+    """Builds rollups once for deployments that have data but predate them"""
+    if await db.analytics_rollups.estimated_document_count() == 0 and await db.leads.find_one({}, {"_id": 1}):
+        count = await rebuild_rollups()
+        logging.info(f"Built {count} analytics rollup documents")
+
+# ============= CACHING =============
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ttl seconds.
+
+    Keys are (scope, name) tuples where scope is normally a user id, so every entry
+    belonging to a user can be dropped at once when their data changes."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()  # key -> (value, expires_at)
+        self.scopes: Dict[str, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: tuple, value: Any):
+        self.entries[key] = (value, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        self.scopes.setdefault(key[0], set()).add(key)
+        while len(self.entries) > self.max_size:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, scope: str):
+        keys = self.scopes.pop(scope, ())
+        for key in keys:
+            self.entries.pop(key, None)
+        self.invalidations += len(keys)
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.scopes.clear()
+
+    def _remove(self, key: tuple):
+        self.entries.pop(key, None)
+        scope_keys = self.scopes.get(key[0])
+        if scope_keys is not None:
+            scope_keys.discard(key)
+            if not scope_keys:
+                del self.scopes[key[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+analytics_cache = TTLCache(ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL)
+lead_count_cache = TTLCache(LEAD_COUNT_CACHE_SIZE, LEAD_COUNT_CACHE_TTL)
+
+def invalidate_user_caches(user_id: str):
+    """Called after writes that change a user's lead or campaign numbers"""
+    analytics_cache.invalidate(user_id)
+    lead_count_cache.invalidate(user_id)
+
+# ============= CONDITIONAL GET =============
+# Each user document carries data_version, bumped by touch_user_data() after every write
+# to the user's leads, campaigns or jobs. Polled endpoints derive their ETag from it, so
+# a matching If-None-Match is answered with 304 after one indexed read of the user and
+# before any of the endpoint's own queries run. Analytics cache entries are keyed by the
+# ETag too: another process's writes bump the version without clearing this process's
+# cache, and the body sent with a tag must never be older than the version it names.
+DATA_CACHE_CONTROL = "private, no-cache"
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+async def touch_user_data(user_id: str):
+    """Called after writes that change anything a user's polled endpoints return"""
+    invalidate_user_caches(user_id)
+    await db.users.update_one({"id": user_id}, {"$inc": {"data_version": 1}})
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": DATA_CACHE_CONTROL}
+
+async def user_data_etag(request: Request, response: Response, current_user: dict = Depends(get_current_user)) -> str:
+    """Dependency for polled GET endpoints. Raises NotModified when the client already
+    has the current version, otherwise sets the ETag on the response and returns it.
+
+    The UTC date is part of the tag because analytics ranges default to "today"."""
+    user_id = current_user['user_id']
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "data_version": 1})
+    version = (user_doc or {}).get('data_version', 0)
+    scope = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:12]
+    etag = f'W/"{scope}-{version}-{datetime.now(timezone.utc).strftime("%Y%m%d")}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        raise NotModified(etag)
+    response.headers.update(etag_headers(etag))
+    return etag
+
+# ============= PROGRESS PUB/SUB =============
+class ProgressSubscription:
+    """A single listener on a topic. Deltas published between reads are merged, so a
+    slow reader only ever sees the latest value of each field."""
+
+    def __init__(self):
+        self.pending: Dict[str, Any] = {}
+        self.event = asyncio.Event()
+
+    def push(self, delta: Dict[str, Any]):
+        self.pending.update(delta)
+        self.event.set()
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.event.clear()
+        delta, self.pending = self.pending, {}
+        return delta
+
+class ProgressBroker:
+    """In-process pub/sub for background job progress, keyed by job id"""
+
+    def __init__(self):
+        self.topics: Dict[str, set] = {}
+
+    def subscribe(self, topic: str) -> ProgressSubscription:
+        subscription = ProgressSubscription()
+        self.topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic: str, subscription: ProgressSubscription):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.topics[topic]
+
+    def publish(self, topic: str, delta: Dict[str, Any]):
+        for subscription in self.topics.get(topic, ()):
+            subscription.push(delta)
+
+progress_broker = ProgressBroker()
+
+# ============= LEAD INGESTION =============
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def build_lead_doc(user_id: str, data: Dict[str, Any], job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Builds a lead document ready for insert without constructing a Lead model.
+
+    Only the checks that matter for scraped rows are applied; returns None when the
+    row is unusable (missing business name or malformed email)."""
+    business_name = data.get('business_name')
+    if not isinstance(business_name, str) or not business_name.strip():
+        return None
+    email = data.get('email') or None
+    if email is not None and not (isinstance(email, str) and EMAIL_PATTERN.match(email)):
+        return None
+    rating = data.get('rating')
+    review_count = data.get('review_count')
+    now = datetime.now(timezone.utc)
+    doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "business_name": business_name.strip(),
+        "address": data.get('address'),
+        "website": data.get('website'),
+        "email": email,
+        "phone": data.get('phone'),
+        "rating": float(rating) if rating is not None else None,
+        "review_count": int(review_count) if review_count is not None else None,
+        "gmb_link": data.get('gmb_link'),
+        "source": data.get('source') or "Google Maps",
+        "status": "New",
+        "notes": None,
+        "tags": [],
+        "job_id": job_id,  # The job that first found the lead
+        "job_ids": [job_id] if job_id else [],  # Every job that found it
+        "created_at": now,
+        "last_activity": now,
+    }
+    doc.update(lead_search_fields(doc))
+    doc['fingerprint'] = lead_fingerprint(doc)
+    return doc
+
+class LeadIngestBuffer:
+    """Buffers scraped leads for a job and writes them in bulk, merging duplicates.
+
+    Each lead carries the ids of the jobs that scraped it (job_ids); job membership is
+    read back from the leads collection rather than stored on the job document.
+
+    A batch is flushed when it reaches batch_size or when flush_interval seconds have
+    passed since the last flush, and job progress is updated once per batch."""
+
+    def __init__(self, job_id: str, user_id: str, total: int,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 processed: int = 0, inserted: int = 0, duplicates: int = 0, on_flush=None):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.total = total
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush  # async callback receiving {"processed", "inserted", "duplicates"} after each flush
+        self.pending: List[Dict[str, Any]] = []
+        self.processed = processed
+        self.inserted = inserted
+        self.duplicates = duplicates
+        self.rejected = 0
+        self.last_flush = time.monotonic()
+
+    async def add(self, data: Dict[str, Any]):
+        self.processed += 1
+        doc = build_lead_doc(self.user_id, data, self.job_id)
+        if doc is None:
+            self.rejected += 1
+        else:
+            self.pending.append(doc)
+        progress_broker.publish(self.job_id, {
+            "progress": int((self.processed / self.total) * 100) if self.total else 100,
+            "scraped_leads": self.inserted + len(self.pending),
+        })
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        self.last_flush = time.monotonic()
+        docs, self.pending = self.pending, []
+        if docs:
+            inserted, duplicates = await upsert_lead_docs(docs)
+            self.inserted += len(inserted)
+            self.duplicates += duplicates
+            increments = {}
+            for doc in inserted:
+                add_lead_rollup(increments, doc)
+            await apply_rollup_increments(increments)
+        progress = int((self.processed / self.total) * 100) if self.total else 100
+        await db.scraping_jobs.update_one(
+            {"id": self.job_id},
+            {"$set": {"progress": progress, "scraped_leads": self.inserted, "duplicate_leads": self.duplicates}}
+        )
+        await touch_user_data(self.user_id)
+        progress_broker.publish(self.job_id, {"scraped_leads": self.inserted, "duplicate_leads": self.duplicates})
+        if self.on_flush is not None:
+            await self.on_flush({"processed": self.processed, "inserted": self.inserted, "duplicates": self.duplicates})
+
 # ============= SCRAPER ROUTES =============
 @api_router.post("/scraper/start")
 async def start_scraper(request: StartScraperRequest, current_user: dict = Depends(get_current_user)):
@@ -240,153 +1398,882 @@ async def start_scraper(request: StartScraperRequest, current_user: dict = Depen
     )
     
     job_dict = job.model_dump()
-    job_dict['created_at'] = job_dict['created_at'].isoformat()
     await db.scraping_jobs.insert_one(job_dict)
+    await touch_user_data(user_id)
     
-    # Start background scraping simulation
-    asyncio.create_task(simulate_scraping(job.id, user_id))
+    # Queue background scraping simulation
+    await enqueue_job("scrape", {"job_id": job.id, "user_id": user_id})
     
     return {"job_id": job.id, "status": "started"}
 
-async def simulate_scraping(job_id: str, user_id: str):
-    """Simulates scraping with progress updates"""
+async def simulate_scraping(job_id: str, user_id: str, ctx: Optional["JobContext"] = None):
+    """Simulates scraping with progress updates, resuming from the last checkpoint when
+    run again for an interrupted job"""
     job_doc = await db.scraping_jobs.find_one({"id": job_id})
     total = job_doc['total_leads']
+    resume = ctx.checkpoint_data if ctx else {}
     
-    for i in range(1, total + 1):
+    ingest = LeadIngestBuffer(
+        job_id, user_id, total,
+        processed=resume.get('processed', 0),
+        inserted=resume.get('inserted', 0),
+        duplicates=resume.get('duplicates', 0),
+        on_flush=ctx.checkpoint if ctx else None
+    )
+    for i in range(ingest.processed + 1, total + 1):
         await asyncio.sleep(0.1)  # Simulate scraping delay
         
-        # Create a lead from mock data
-        mock_lead = random.choice(MOCK_LEADS_DATA)
-        lead = Lead(
-            user_id=user_id,
-            business_name=f"{mock_lead['business_name']} #{i}",
-            address=mock_lead['address'],
-            website=mock_lead['website'],
-            email=mock_lead['email'],
-            phone=mock_lead['phone'],
-            rating=mock_lead['rating'],
-            review_count=mock_lead['review_count'],
-            gmb_link=mock_lead['gmb_link'],
-            source=mock_lead['source']
-        )
-        
-        lead_dict = lead.model_dump()
-        lead_dict['created_at'] = lead_dict['created_at'].isoformat()
-        lead_dict['last_activity'] = lead_dict['last_activity'].isoformat()
-        await db.leads.insert_one(lead_dict)
-        
-        # Update job progress
-        await db.scraping_jobs.update_one(
-            {"id": job_id},
-            {"$set": {"progress": int((i / total) * 100), "scraped_leads": i}, "$push": {"results": lead.id}}
-        )
+        # Create a lead from mock data; the i-th result for a search is always the same
+        # business, so repeating a search finds the same places again
+        rng = random.Random(f"{job_doc['keyword']}|{job_doc['location']}|{i}".lower())
+        mock_lead = rng.choice(MOCK_LEADS_DATA)
+        await ingest.add({
+            **mock_lead,
+            "business_name": f"{mock_lead['business_name']} #{i}",
+            "gmb_link": f"{mock_lead['gmb_link']}-{rng.randrange(10 ** 8)}",
+        })
+    
+    await ingest.flush()
     
     # Mark job as completed
-    await db.scraping_jobs.update_one(
-        {"id": job_id},
-        {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}}
-    )
+    completed = {"status": "completed", "completed_at": datetime.now(timezone.utc)}
+    await db.scraping_jobs.update_one({"id": job_id}, {"$set": completed})
+    await touch_user_data(user_id)
+    progress_broker.publish(job_id, {
+        "progress": 100, "scraped_leads": ingest.inserted, "duplicate_leads": ingest.duplicates, **completed
+    })
+
+SCRAPER_JOB_STATUS_FIELDS = {
+    "_id": 0, "id": 1, "keyword": 1, "location": 1, "filters": 1, "status": 1, "progress": 1,
+    "total_leads": 1, "scraped_leads": 1, "duplicate_leads": 1, "created_at": 1, "completed_at": 1,
+}
 
 @api_router.get("/scraper/status/{job_id}")
-async def get_scraper_status(job_id: str, current_user: dict = Depends(get_current_user)):
-    job = await db.scraping_jobs.find_one({"id": job_id}, {"_id": 0})
+async def get_scraper_status(
+    job_id: str, etag: str = Depends(user_data_etag), current_user: dict = Depends(get_current_user)
+):
+    job = await db.scraping_jobs.find_one(
+        {"id": job_id, "user_id": current_user['user_id']}, SCRAPER_JOB_STATUS_FIELDS
+    )
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 @api_router.get("/scraper/jobs")
-async def get_scraper_jobs(current_user: dict = Depends(get_current_user)):
+async def get_scraper_jobs(
+    fields: Optional[str] = None, etag: str = Depends(user_data_etag), current_user: dict = Depends(get_current_user)
+):
     user_id = current_user['user_id']
-    jobs = await db.scraping_jobs.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return jobs
+    job_fields = tuple(field for field in SCRAPER_JOB_STATUS_FIELDS if field != "_id")
+    projection = field_projection(fields, job_fields, job_fields)
+    jobs = await db.scraping_jobs.find({"user_id": user_id}, projection).sort("created_at", -1).to_list(100)
+    return FastJSONResponse(jobs, headers=etag_headers(etag))
+
+@api_router.get("/scraper/jobs/{job_id}/results")
+async def get_scraper_job_results(
+    job_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Returns the leads a job found, including known leads it merged into, oldest first,
+    one cursor page at a time"""
+    user_id = current_user['user_id']
+    limit = max(1, min(limit, 500))
+    job = await db.scraping_jobs.find_one({"id": job_id, "user_id": user_id}, {"_id": 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    query = {"user_id": user_id, "job_ids": job_id}
+    if cursor:
+        query.update(cursor_filter(cursor, descending=False))
+    projection = field_projection(fields, LEAD_FIELDS, LEAD_SUMMARY_FIELDS, required=("id", "created_at"))
+    leads = await db.leads.find(query, projection).sort([("created_at", 1), ("id", 1)]).limit(limit).to_list(limit)
+    next_cursor = encode_cursor(leads[-1]) if len(leads) == limit else None
+    return FastJSONResponse({"leads": leads, "next_cursor": next_cursor})
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode('utf-8')}\n\n"
+
+@api_router.get("/scraper/jobs/{job_id}/events")
+async def stream_scraper_progress(job_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Server-sent events stream of job progress: a snapshot, then merged deltas until the job finishes"""
+    query = {"id": job_id, "user_id": current_user['user_id']}
+    subscription = progress_broker.subscribe(job_id)
+    job = await db.scraping_jobs.find_one(query, SCRAPER_JOB_STATUS_FIELDS)
+    if not job:
+        progress_broker.unsubscribe(job_id, subscription)
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        state = job
+        try:
+            yield format_sse("progress", state)
+            while state.get('status') not in ("completed", "failed"):
+                if await request.is_disconnected():
+                    break
+                delta = await subscription.next(PROGRESS_FALLBACK_POLL_SECONDS)
+                if delta is None:
+                    # Nothing published here (the job may run in another worker); re-read the job
+                    latest = await db.scraping_jobs.find_one(query, SCRAPER_JOB_STATUS_FIELDS)
+                    if latest is None:
+                        break
+                    delta = {k: v for k, v in latest.items() if state.get(k) != v}
+                    if not delta:
+                        yield ": keepalive\n\n"
+                        continue
+                state = {**state, **delta}
+                yield format_sse("progress", delta)
+                await asyncio.sleep(PROGRESS_PUBLISH_INTERVAL)
+        finally:
+            progress_broker.unsubscribe(job_id, subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.delete("/scraper/job/{job_id}")
 async def delete_scraper_job(job_id: str, current_user: dict = Depends(get_current_user)):
     result = await db.scraping_jobs.delete_one({"id": job_id, "user_id": current_user['user_id']})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
+    await touch_user_data(current_user['user_id'])
     return {"message": "Job deleted successfully"}
 
 # ============= LEADS ROUTES =============
+async def count_leads(query: Dict[str, Any], mode: str) -> Optional[int]:
+    """Counts leads matching query. mode is "exact", "cached" (count reused for
+    LEAD_COUNT_CACHE_TTL seconds) or "none" (skip counting)."""
+    if mode == "none":
+        return None
+    if mode == "cached":
+        key = (query['user_id'], json.dumps(query, sort_keys=True, default=str))
+        cached = lead_count_cache.get(key)
+        if cached is not None:
+            return cached
+    total = await db.leads.count_documents(query)
+    if mode == "cached":
+        lead_count_cache.set(key, total)
+    return total
+
+def lead_list_filter(user_id: str, status: Optional[str], source: Optional[str], search: Optional[str],
+                     date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """Mongo filter shared by the lead list, export and bulk operations, plus the search
+    tokens (empty when not searching). date_from/date_to bound created_at, inclusive."""
+    query = {"user_id": user_id}
+    if status:
+        query["status"] = status
+    if source:
+        query["source"] = source
+    query.update(date_range_filter("created_at", *date_range(date_from, date_to)))
+    tokens = search_query_tokens(search) if search else []
+    if tokens:
+        query["search_terms"] = {"$all": tokens}
+    elif search and search.strip():
+        # Too short to tokenize (e.g. the first keystroke): match the start of the name
+        query["business_name"] = {"$regex": f"^{re.escape(search.strip())}", "$options": "i"}
+    return query, tokens
+
 @api_router.get("/leads")
 async def get_leads(
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    total: str = "exact",  # exact, cached, none
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    search: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lists leads newest first, optionally created between from and to (YYYY-MM-DD or
+    ISO datetime). Pass the returned next_cursor to page forward in constant time; skip
+    is still honoured when no cursor is given. With search, leads matching every word
+    prefix are returned by relevance instead. fields= selects the returned columns."""
+    if total not in ("exact", "cached", "none"):
+        raise HTTPException(status_code=400, detail="total must be one of exact, cached, none")
+    limit = max(1, min(limit, 500))
+    projection = field_projection(fields, LEAD_FIELDS, LEAD_SUMMARY_FIELDS, required=("id", "created_at"))
+    query, tokens = lead_list_filter(current_user['user_id'], status, source, search, date_from, date_to)
+    if tokens:
+        offset = decode_offset_cursor(cursor) if cursor else skip
+        leads = await db.leads.aggregate([
+            {"$match": query},
+            search_score_stage(tokens),
+            {"$sort": {"search_score": -1, "created_at": -1, "id": -1}},
+            {"$skip": offset},
+            {"$limit": limit + 1},
+            {"$project": projection},
+        ]).to_list(limit + 1)
+        has_more = len(leads) > limit
+        return FastJSONResponse({
+            "leads": leads[:limit],
+            "total": await count_leads(query, total),
+            "next_cursor": encode_offset_cursor(offset + limit) if has_more else None,
+        })
+    
+    page_query = dict(query)
+    if cursor:
+        page_query = {"$and": [query, cursor_filter(cursor)]}
+    find = db.leads.find(page_query, projection).sort([("created_at", -1), ("id", -1)])
+    if not cursor and skip:
+        find = find.skip(skip)
+    leads = await find.limit(limit + 1).to_list(limit + 1)
+    has_more = len(leads) > limit
+    leads = leads[:limit]
+    
+    return FastJSONResponse({
+        "leads": leads,
+        "total": await count_leads(query, total),
+        "next_cursor": encode_cursor(leads[-1]) if has_more else None,
+    })
+
+# ============= LEAD EXPORT / IMPORT =============
+LEAD_EXPORT_FIELDS = [
+    "id", "business_name", "address", "website", "email", "phone", "rating", "review_count",
+    "gmb_link", "source", "status", "notes", "tags", "created_at", "last_activity",
+]
+
+def export_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+@api_router.get("/leads/export")
+async def export_leads(
+    format: str = "csv",  # csv, ndjson
     status: Optional[str] = None,
     source: Optional[str] = None,
     search: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
     current_user: dict = Depends(get_current_user)
 ):
+    """Streams every lead matching the get_leads filters straight from a Mongo cursor,
+    EXPORT_FLUSH_ROWS rows per chunk, so memory use does not grow with the export"""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    query, tokens = lead_list_filter(current_user['user_id'], status, source, search, date_from, date_to)
+    projection = {"_id": 0, **{field: 1 for field in LEAD_EXPORT_FIELDS}}
+    if tokens:
+        cursor = db.leads.aggregate([
+            {"$match": query},
+            search_score_stage(tokens),
+            {"$sort": {"search_score": -1, "created_at": -1, "id": -1}},
+            {"$project": projection},
+        ], allowDiskUse=True, batchSize=EXPORT_FLUSH_ROWS)
+    else:
+        cursor = db.leads.find(query, projection).sort([("created_at", -1), ("id", -1)]).batch_size(EXPORT_FLUSH_ROWS)
+    
+    async def rows():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if format == "csv":
+            writer.writerow(LEAD_EXPORT_FIELDS)
+        written = 0
+        async for lead in cursor:
+            if format == "csv":
+                writer.writerow([export_cell(lead.get(field)) for field in LEAD_EXPORT_FIELDS])
+            else:
+                out.write(orjson.dumps(lead).decode('utf-8') + "\n")
+            written += 1
+            if written % EXPORT_FLUSH_ROWS == 0:
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue()
+    
+    filename = f"leads-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+async def iter_text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodes a UTF-8 byte stream (BOM allowed) into lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def iter_import_rows(lines: AsyncIterator[str], format: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Yields (row_number, row) where row is a dict, or an Exception for an unreadable row.
+    CSV rows are keyed by the header line; quoted fields may span several lines."""
+    row_number = 0
+    if format == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield row_number, row if isinstance(row, dict) else ValueError("Each line must be a JSON object")
+        return
+    
+    header = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            if len(record) < IMPORT_MAX_RECORD_CHARS:
+                continue
+            row_number += 1
+            yield row_number, ValueError("Row too long or has an unterminated quoted field")
+            record = ""
+            continue
+        values, record = next(csv.reader([record]), []), ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values))
+    if record:
+        yield row_number + 1, ValueError("Unterminated quoted field")
+
+def import_lead_doc(user_id: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds a lead from an imported row, raising ValueError when the row is unusable"""
+    data = {key.strip().lower(): (None if value == "" else value) for key, value in row.items() if isinstance(key, str)}
+    data['source'] = data.get('source') or "Import"
+    doc = build_lead_doc(user_id, data)
+    if doc is None:
+        raise ValueError("business_name is required and email must be valid")
+    if isinstance(data.get('status'), str):
+        doc['status'] = data['status']
+    if isinstance(data.get('notes'), str):
+        doc['notes'] = data['notes']
+    tags = data.get('tags')
+    if isinstance(tags, str):
+        tags = tags.split(";")
+    if isinstance(tags, list):
+        doc['tags'] = [str(tag).strip() for tag in tags if str(tag).strip()]
+        doc.update(lead_search_fields(doc))
+    return doc
+
+@api_router.post("/leads/import")
+async def import_leads(request: Request, format: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Imports leads from a CSV (with header) or NDJSON request body, read incrementally
+    and written in bulk every IMPORT_BATCH_SIZE rows; rows matching an existing lead's
+    fingerprint are merged into it. The format is taken from
+    the format parameter or the Content-Type. Invalid rows are skipped and reported."""
+    content_type = request.headers.get('content-type', '')
+    format = format or ("ndjson" if "ndjson" in content_type or "json" in content_type else "csv")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
     user_id = current_user['user_id']
-    query = {"user_id": user_id}
+    pending: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    processed = inserted = duplicates = failed = 0
     
-    if status:
-        query["status"] = status
-    if source:
-        query["source"] = source
-    if search:
-        query["$or"] = [
-            {"business_name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
-        ]
+    async def flush():
+        nonlocal pending, inserted, duplicates
+        docs, pending = pending, []
+        if not docs:
+            return
+        new_docs, merged = await upsert_lead_docs(docs)
+        inserted += len(new_docs)
+        duplicates += merged
+        increments = {}
+        for doc in new_docs:
+            add_lead_rollup(increments, doc)
+        await apply_rollup_increments(increments)
+        await touch_user_data(user_id)
     
-    leads = await db.leads.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    total = await db.leads.count_documents(query)
+    async for row_number, row in iter_import_rows(iter_text_lines(request.stream()), format):
+        processed += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            pending.append(import_lead_doc(user_id, row))
+        except (ValueError, TypeError) as e:
+            failed += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": str(e)})
+            continue
+        if len(pending) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
     
-    return {"leads": leads, "total": total}
+    return {
+        "processed": processed,
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
 
 @api_router.get("/leads/{lead_id}")
 async def get_lead(lead_id: str, current_user: dict = Depends(get_current_user)):
-    lead = await db.leads.find_one({"id": lead_id, "user_id": current_user['user_id']}, {"_id": 0})
+    lead = await db.leads.find_one({"id": lead_id, "user_id": current_user['user_id']}, LEAD_PROJECTION)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     return lead
 
 @api_router.put("/leads/{lead_id}")
 async def update_lead(lead_id: str, updates: dict, current_user: dict = Depends(get_current_user)):
-    updates['last_activity'] = datetime.now(timezone.utc).isoformat()
-    result = await db.leads.update_one(
-        {"id": lead_id, "user_id": current_user['user_id']},
-        {"$set": updates}
-    )
-    if result.matched_count == 0:
+    for field in ("_id", "id", "user_id", "search_terms", "search_words", "fingerprint", "job_id", "job_ids"):
+        updates.pop(field, None)
+    updates['last_activity'] = datetime.now(timezone.utc)
+    lead = await update_lead_fields({"id": lead_id, "user_id": current_user['user_id']}, updates)
+    if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    if 'status' in updates or 'source' in updates:
+        # Move the lead between the status and source counters it was and is now under
+        increments = {}
+        add_lead_rollup(increments, lead, sign=-1)
+        add_lead_rollup(increments, {**lead, **updates})
+        await apply_rollup_increments(increments)
+    await touch_user_data(current_user['user_id'])
     return {"message": "Lead updated successfully"}
 
 @api_router.delete("/leads/{lead_id}")
 async def delete_lead(lead_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.leads.delete_one({"id": lead_id, "user_id": current_user['user_id']})
-    if result.deleted_count == 0:
+    lead = await db.leads.find_one_and_delete(
+        {"id": lead_id, "user_id": current_user['user_id']}, projection=ROLLUP_LEAD_FIELDS
+    )
+    if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    increments = {}
+    add_lead_rollup(increments, lead, sign=-1)
+    await apply_rollup_increments(increments)
+    await touch_user_data(current_user['user_id'])
     return {"message": "Lead deleted successfully"}
 
 @api_router.post("/leads/bulk-delete")
 async def bulk_delete_leads(lead_ids: List[str], current_user: dict = Depends(get_current_user)):
-    result = await db.leads.delete_many({"id": {"$in": lead_ids}, "user_id": current_user['user_id']})
+    user_id = current_user['user_id']
+    leads = await db.leads.find(
+        {"id": {"$in": lead_ids}, "user_id": user_id}, {**ROLLUP_LEAD_FIELDS, "id": 1}
+    ).to_list(len(lead_ids))
+    result = await db.leads.delete_many({"id": {"$in": [lead['id'] for lead in leads]}, "user_id": user_id})
+    if result.deleted_count:
+        increments = {}
+        for lead in leads:
+            add_lead_rollup(increments, lead, sign=-1)
+        await apply_rollup_increments(increments)
+        await touch_user_data(user_id)
     return {"deleted_count": result.deleted_count}
 
+@api_router.post("/leads/batch-get")
+async def batch_get_leads(request: BatchGetLeadsRequest, current_user: dict = Depends(get_current_user)):
+    """Fetches several leads in one query, returned in the order the IDs were requested"""
+    projection = LEAD_PROJECTION
+    if request.fields:
+        projection = field_projection(','.join(request.fields), LEAD_FIELDS, LEAD_FIELDS)
+    ids = list(dict.fromkeys(request.ids))
+    docs = await db.leads.find(
+        {"id": {"$in": ids}, "user_id": current_user['user_id']}, projection
+    ).to_list(len(ids))
+    by_id = {doc['id']: doc for doc in docs}
+    return FastJSONResponse({
+        "leads": [by_id[lead_id] for lead_id in ids if lead_id in by_id],
+        "missing": [lead_id for lead_id in ids if lead_id not in by_id],
+    })
+
 @api_router.post("/leads/{lead_id}/notes")
 async def add_lead_note(lead_id: str, note: dict, current_user: dict = Depends(get_current_user)):
     result = await db.leads.update_one(
         {"id": lead_id, "user_id": current_user['user_id']},
-        {"$set": {"notes": note.get('text'), "last_activity": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"notes": note.get('text'), "last_activity": datetime.now(timezone.utc)}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Lead not found")
+    await touch_user_data(current_user['user_id'])
     return {"message": "Note added successfully"}
 
 @api_router.post("/leads/{lead_id}/tags")
 async def add_lead_tags(lead_id: str, tags_data: dict, current_user: dict = Depends(get_current_user)):
     tags = tags_data.get('tags', [])
-    result = await db.leads.update_one(
+    lead = await update_lead_fields(
         {"id": lead_id, "user_id": current_user['user_id']},
-        {"$set": {"tags": tags, "last_activity": datetime.now(timezone.utc).isoformat()}}
+        {"tags": tags, "last_activity": datetime.now(timezone.utc)}
     )
-    if result.matched_count == 0:
+    if lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    await touch_user_data(current_user['user_id'])
     return {"message": "Tags updated successfully"}
 
+# ============= BULK LEAD OPERATIONS =============
+# A bulk operation is recorded in lead_operations and carried out by a background job
+# that walks the matching leads in id order, BULK_CHUNK_SIZE at a time, with one
+# update_many/delete_many per chunk. Walking by id keeps the scan stable while the
+# operation changes the fields it filters on, and the last id is the resume checkpoint.
+BULK_LEAD_ACTIONS = ("set_status", "set_notes", "add_tags", "remove_tags", "delete")
+
+BULK_OPERATION_FIELDS = {
+    "_id": 0, "id": 1, "action": 1, "status": 1, "total": 1, "processed": 1, "changed": 1,
+    "created_at": 1, "completed_at": 1,
+}
+
+def bulk_operation_query(operation: Dict[str, Any]) -> Dict[str, Any]:
+    if operation.get('lead_ids') is not None:
+        return {"user_id": operation['user_id'], "id": {"$in": operation['lead_ids']}}
+    lead_filter = operation.get('filter') or {}
+    query, _ = lead_list_filter(
+        operation['user_id'], lead_filter.get('status'), lead_filter.get('source'), lead_filter.get('search'),
+        lead_filter.get('date_from'), lead_filter.get('date_to')
+    )
+    return query
+
+def bulk_lead_update(operation: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    action, params = operation['action'], operation['params']
+    if action == "set_status":
+        return {"$set": {"status": params['status'], "last_activity": now}}
+    if action == "set_notes":
+        return {"$set": {"notes": params['notes'], "last_activity": now}}
+    if action == "add_tags":
+        return {"$addToSet": {"tags": {"$each": params['tags']}}, "$set": {"last_activity": now}}
+    return {"$pull": {"tags": {"$in": params['tags']}}, "$set": {"last_activity": now}}
+
+async def apply_bulk_chunk(operation: Dict[str, Any], leads: List[Dict[str, Any]]) -> int:
+    """Applies the operation to one chunk of leads and keeps rollups and search fields in step"""
+    user_id = operation['user_id']
+    ids = [lead['id'] for lead in leads]
+    increments = {}
+    if operation['action'] == "delete":
+        result = await db.leads.delete_many({"id": {"$in": ids}, "user_id": user_id})
+        for lead in leads:
+            add_lead_rollup(increments, lead, sign=-1)
+        changed = result.deleted_count
+    else:
+        result = await db.leads.update_many({"id": {"$in": ids}, "user_id": user_id}, bulk_lead_update(operation))
+        changed = result.modified_count
+        if operation['action'] == "set_status":
+            for lead in leads:
+                add_status_rollup(increments, lead, operation['params']['status'])
+        if operation['action'] in ("add_tags", "remove_tags"):
+            docs = await db.leads.find(
+                {"id": {"$in": ids}}, {"_id": 0, "id": 1, **{f: 1 for f in SEARCHABLE_LEAD_FIELDS}}
+            ).to_list(len(ids))
+            if docs:
+                await db.leads.bulk_write(
+                    [UpdateOne({"id": doc['id']}, {"$set": lead_search_fields(doc)}) for doc in docs], ordered=False
+                )
+    await apply_rollup_increments(increments)
+    return changed
+
+async def run_bulk_leads_job(payload: Dict[str, Any], ctx: "JobContext"):
+    operation = await db.lead_operations.find_one({"id": payload['operation_id']}, {"_id": 0})
+    query = bulk_operation_query(operation)
+    resume = ctx.checkpoint_data
+    last_id = resume.get('last_id')
+    processed = resume.get('processed', 0)
+    changed = resume.get('changed', 0)
+    await db.lead_operations.update_one({"id": operation['id']}, {"$set": {"status": "running"}})
+    
+    while True:
+        chunk_query = {**query, "id": {**query.get("id", {}), "$gt": last_id}} if last_id else query
+        leads = await db.leads.find(
+            chunk_query, {**ROLLUP_LEAD_FIELDS, "id": 1}
+        ).sort("id", 1).limit(BULK_CHUNK_SIZE).to_list(BULK_CHUNK_SIZE)
+        if not leads:
+            break
+        changed += await apply_bulk_chunk(operation, leads)
+        processed += len(leads)
+        last_id = leads[-1]['id']
+        await touch_user_data(operation['user_id'])
+        progress = {"processed": processed, "changed": changed}
+        await db.lead_operations.update_one({"id": operation['id']}, {"$set": progress})
+        progress_broker.publish(operation['id'], progress)
+        await ctx.checkpoint({"last_id": last_id, **progress})
+    
+    completed = {"status": "completed", "completed_at": datetime.now(timezone.utc)}
+    await db.lead_operations.update_one({"id": operation['id']}, {"$set": completed})
+    progress_broker.publish(operation['id'], completed)
+
+async def fail_bulk_leads_job(payload: Dict[str, Any]):
+    failed = {"status": "failed", "completed_at": datetime.now(timezone.utc)}
+    await db.lead_operations.update_one({"id": payload['operation_id']}, {"$set": failed})
+    progress_broker.publish(payload['operation_id'], failed)
+
+@api_router.post("/leads/bulk")
+async def start_bulk_lead_operation(request: BulkLeadOperationRequest, current_user: dict = Depends(get_current_user)):
+    """Queues a bulk operation on the given leads, or on every lead matching filter, and
+    returns it; poll GET /leads/bulk/{operation_id} for progress"""
+    if request.action not in BULK_LEAD_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"action must be one of {', '.join(BULK_LEAD_ACTIONS)}")
+    if request.lead_ids is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide lead_ids or a filter")
+    if request.action == "set_status" and not request.status:
+        raise HTTPException(status_code=400, detail="status is required")
+    if request.action in ("add_tags", "remove_tags") and not request.tags:
+        raise HTTPException(status_code=400, detail="tags are required")
+    
+    user_id = current_user['user_id']
+    operation = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "action": request.action,
+        "params": {"status": request.status, "notes": request.notes, "tags": request.tags},
+        "lead_ids": list(dict.fromkeys(request.lead_ids)) if request.lead_ids is not None else None,
+        "filter": request.filter.model_dump() if request.lead_ids is None else None,
+        "status": "queued",  # queued, running, completed, failed
+        "total": 0,
+        "processed": 0,
+        "changed": 0,
+        "created_at": datetime.now(timezone.utc),
+        "completed_at": None,
+    }
+    operation['total'] = await db.leads.count_documents(bulk_operation_query(operation))
+    await db.lead_operations.insert_one(operation)
+    await enqueue_job("bulk_leads", {"operation_id": operation['id']})
+    return {field: operation[field] for field in BULK_OPERATION_FIELDS if field != "_id"}
+
+@api_router.get("/leads/bulk/{operation_id}")
+async def get_bulk_lead_operation(operation_id: str, current_user: dict = Depends(get_current_user)):
+    operation = await db.lead_operations.find_one(
+        {"id": operation_id, "user_id": current_user['user_id']}, BULK_OPERATION_FIELDS
+    )
+    if not operation:
+        raise HTTPException(status_code=404, detail="Operation not found")
+    return operation
+
+# ============= EMAIL TRACKING =============
+TRACKING_PIXEL = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+TRACKED_URL_PATTERN = re.compile(r'https?://[^\s<>"]+')
+
+def tracking_signature(log_id: str, url: str) -> str:
+    return hmac.new(TRACKING_SECRET.encode('utf-8'), f"{log_id}|{url}".encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def tracked_click_url(log_id: str, url: str) -> str:
+    query = urlencode({"url": url, "sig": tracking_signature(log_id, url)})
+    return f"{TRACKING_BASE_URL}/api/t/click/{log_id}?{query}"
+
+def render_tracked_html(body: str, log_id: str) -> str:
+    """Turns a plain-text campaign body into HTML with tracked links and an open pixel"""
+    def link(match):
+        url = html.unescape(match.group(0))
+        return f'<a href="{html.escape(tracked_click_url(log_id, url))}">{match.group(0)}</a>'
+    content = TRACKED_URL_PATTERN.sub(link, html.escape(body)).replace('\n', '<br>')
+    pixel = f'<img src="{TRACKING_BASE_URL}/api/t/open/{log_id}.gif" width="1" height="1" alt="" style="display:none">'
+    return f"<html><body>{content}{pixel}</body></html>"
+
+class TrackingBuffer:
+    """In-memory buffer of open/click events.
+
+    Repeated events for the same email are de-duplicated in memory, and the batch is
+    flushed to email_logs, campaign counters and rollups every TRACKING_FLUSH_INTERVAL
+    seconds, or sooner once TRACKING_MAX_BUFFERED_EVENTS are waiting."""
+
+    def __init__(self, flush_interval: float = TRACKING_FLUSH_INTERVAL, max_events: int = TRACKING_MAX_BUFFERED_EVENTS):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.events: Dict[tuple, datetime] = {}  # (log_id, "open" | "click") -> first seen time
+        self.early_flush: Optional[asyncio.Task] = None
+
+    def record(self, log_id: str, kind: str):
+        self.events.setdefault((log_id, kind), datetime.now(timezone.utc))
+        if len(self.events) >= self.max_events and (self.early_flush is None or self.early_flush.done()):
+            self.early_flush = asyncio.create_task(self.flush())
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Tracking flush failed: {str(e)}")
+
+    async def flush(self):
+        events, self.events = self.events, {}
+        if not events:
+            return
+        opens = {log_id: ts for (log_id, kind), ts in events.items() if kind == "open"}
+        clicks = {log_id: ts for (log_id, kind), ts in events.items() if kind == "click"}
+        for log_id, ts in clicks.items():
+            opens.setdefault(log_id, ts)  # A click proves the email was opened even if the pixel was blocked
+        
+        logs = await db.email_logs.find(
+            {"id": {"$in": list(opens)}}, {"_id": 0, "id": 1, "campaign_id": 1, "opened_at": 1, "clicked_at": 1}
+        ).to_list(len(opens))
+        # Guarded updates grouped by (campaign, event, day), one bulk_write per group, so
+        # the counters and rollups are taken from what each group actually modified. A
+        # flush running at the same time (another process, or an early flush) then never
+        # counts an event twice.
+        groups: Dict[tuple, List[UpdateOne]] = {}
+        for log in logs:
+            if log['id'] in opens and not log.get('opened_at'):
+                ts = opens[log['id']]
+                groups.setdefault((log['campaign_id'], "opened", rollup_day(ts)), []).append(UpdateOne(
+                    {"id": log['id'], "opened_at": None},
+                    [{"$set": {"opened_at": ts, "status": {
+                        "$cond": [{"$eq": ["$status", "clicked"]}, "clicked", "opened"]
+                    }}}]
+                ))
+            if log['id'] in clicks and not log.get('clicked_at'):
+                ts = clicks[log['id']]
+                groups.setdefault((log['campaign_id'], "clicked", rollup_day(ts)), []).append(UpdateOne(
+                    {"id": log['id'], "clicked_at": None}, {"$set": {"clicked_at": ts, "status": "clicked"}}
+                ))
+        if not groups:
+            return
+        results = await asyncio.gather(*(db.email_logs.bulk_write(ops, ordered=False) for ops in groups.values()))
+        
+        counters: Dict[str, Dict[str, int]] = {}
+        event_days: Dict[str, Dict[str, Dict[str, int]]] = {}  # campaign -> day -> rollup field -> count
+        for (campaign_id, event, day), result in zip(groups, results):
+            if not result.modified_count:
+                continue
+            campaign_counters = counters.setdefault(campaign_id, {})
+            campaign_counters[f"{event}_count"] = campaign_counters.get(f"{event}_count", 0) + result.modified_count
+            day_deltas = event_days.setdefault(campaign_id, {}).setdefault(day, {})
+            day_deltas[f"emails_{event}"] = day_deltas.get(f"emails_{event}", 0) + result.modified_count
+        if not counters:
+            return
+        
+        campaigns = await db.campaigns.find(
+            {"id": {"$in": list(counters)}}, {"_id": 0, "id": 1, "user_id": 1}
+        ).to_list(len(counters))
+        await db.campaigns.bulk_write([
+            UpdateOne({"id": campaign_id}, {"$inc": incs}) for campaign_id, incs in counters.items()
+        ], ordered=False)
+        increments = {}
+        for campaign in campaigns:
+            for day, deltas in event_days[campaign['id']].items():
+                add_rollup_increments(increments, campaign['user_id'], day, **deltas)
+        await apply_rollup_increments(increments)
+        for user_id in {campaign['user_id'] for campaign in campaigns}:
+            await touch_user_data(user_id)
+
+tracking_buffer = TrackingBuffer()
+
+# ============= SENDING ENGINE =============
+class TokenBucket:
+    """Async token bucket: rate tokens per second, holding at most capacity tokens"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class LocalSMTPTransport:
+    """Stand-in for an SMTP relay: accepts every message after a simulated round trip.
+
+    It also stands in for recipients, reporting opens and clicks through the tracking
+    buffer a little later, as a real mail client loading the pixel or a link would."""
+
+    async def send(self, sender: Dict[str, Any], recipient: str, subject: str, html_body: str, message_id: str):
+        await asyncio.sleep(random.uniform(0.05, 0.15))
+        loop = asyncio.get_running_loop()
+        if random.random() > 0.4:  # 60% open rate
+            loop.call_later(random.uniform(5, 60), tracking_buffer.record, message_id, "open")
+            if random.random() > 0.7:  # 30% click rate
+                loop.call_later(random.uniform(60, 120), tracking_buffer.record, message_id, "click")
+
+email_transport = LocalSMTPTransport()
+
+# Buckets are process-wide so concurrent campaigns share each mailbox's and domain's budget
+mailbox_buckets: Dict[str, TokenBucket] = {}
+domain_buckets = OrderedDict()  # recipient domain -> TokenBucket, least recently used first
+DOMAIN_BUCKETS_MAX = 10000
+
+def get_mailbox_bucket(account: Dict[str, Any]) -> TokenBucket:
+    rate_per_minute = account['rate_per_minute']
+    bucket = mailbox_buckets.get(account['id'])
+    if bucket is None or bucket.capacity != rate_per_minute:
+        bucket = TokenBucket(rate_per_minute / 60, rate_per_minute)
+        mailbox_buckets[account['id']] = bucket
+    return bucket
+
+def get_domain_bucket(domain: str) -> TokenBucket:
+    bucket = domain_buckets.get(domain)
+    if bucket is None:
+        bucket = TokenBucket(SEND_DOMAIN_RATE_PER_MINUTE / 60, max(1, SEND_DOMAIN_RATE_PER_MINUTE // 6))
+        domain_buckets[domain] = bucket
+        while len(domain_buckets) > DOMAIN_BUCKETS_MAX:
+            domain_buckets.popitem(last=False)
+    domain_buckets.move_to_end(domain)
+    return bucket
+
+async def load_sender_mailboxes(user_id: str) -> List[Dict[str, Any]]:
+    """Active email accounts in sending order; a default sender if none are configured"""
+    accounts = await db.email_accounts.find(
+        {"user_id": user_id, "status": "Active"}, {"_id": 0}
+    ).sort("is_primary", -1).to_list(100)
+    if not accounts:
+        return [{"id": f"default:{user_id}", "email": None, "sender_name": None,
+                 "rate_per_minute": SEND_DEFAULT_RATE_PER_MINUTE, "metered": False, "exhausted": False}]
+    for account in accounts:
+        account['metered'] = True
+        account['exhausted'] = False
+    return accounts
+
+async def reserve_mailbox_send(mailbox_id: str) -> bool:
+    """Takes one send from the mailbox's daily quota in Mongo, starting a new count on
+    the first send of a UTC day. False when today's quota is used up.
+
+    Reserving each send before it goes out keeps the quota right across concurrent
+    campaigns, worker processes and resumed or crashed runs."""
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    result = await db.email_accounts.update_one(
+        {"id": mailbox_id, "$or": [
+            {"sent_date": {"$ne": today}},
+            {"$expr": {"$lt": [{"$ifNull": ["$sent_today", 0]}, "$daily_limit"]}},
+        ]},
+        [{"$set": {
+            "sent_today": {"$cond": [
+                {"$eq": ["$sent_date", today]}, {"$add": [{"$ifNull": ["$sent_today", 0]}, 1]}, 1
+            ]},
+            "sent_date": today,
+        }}]
+    )
+    return result.modified_count == 1
+
+async def release_mailbox_send(mailbox_id: str):
+    """Gives back a reserved send that was never delivered"""
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    await db.email_accounts.update_one(
+        {"id": mailbox_id, "sent_date": today, "sent_today": {"$gt": 0}}, {"$inc": {"sent_today": -1}}
+    )
+
+async def next_mailbox(mailboxes: List[Dict[str, Any]], state: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """Round-robins over mailboxes that still have quota today, reserving one send"""
+    for _ in range(len(mailboxes)):
+        mailbox = mailboxes[state['next'] % len(mailboxes)]
+        state['next'] += 1
+        if mailbox['exhausted']:
+            continue
+        if not mailbox['metered'] or await reserve_mailbox_send(mailbox['id']):
+            return mailbox
+        mailbox['exhausted'] = True
+    return None
+
 # ============= CAMPAIGNS ROUTES =============
 @api_router.post("/campaigns")
 async def create_campaign(request: CreateCampaignRequest, current_user: dict = Depends(get_current_user)):
@@ -399,74 +2286,185 @@ async def create_campaign(request: CreateCampaignRequest, current_user: dict = D
         total_emails=len(request.lead_ids),
         follow_up_enabled=request.follow_up_enabled,
         follow_up_delay_days=request.follow_up_delay_days,
-        status="running"
+        status="running" if request.start else "draft"
     )
     
     campaign_dict = campaign.model_dump()
-    campaign_dict['created_at'] = campaign_dict['created_at'].isoformat()
     await db.campaigns.insert_one(campaign_dict)
+    await touch_user_data(current_user['user_id'])
+    if not request.start:
+        return {"campaign_id": campaign.id, "status": "draft"}
     
-    # Simulate email sending
-    asyncio.create_task(simulate_email_sending(campaign.id))
+    # Queue email sending
+    await enqueue_job("send_campaign", {"campaign_id": campaign.id, "concurrency": request.concurrency})
     
     return {"campaign_id": campaign.id, "status": "started"}
 
-async def simulate_email_sending(campaign_id: str):
-    """Simulates email sending with tracking"""
-    campaign_doc = await db.campaigns.find_one({"id": campaign_id})
-    lead_ids = campaign_doc['lead_ids']
-    
-    for lead_id in lead_ids:
-        await asyncio.sleep(0.5)  # Simulate sending delay
-        
-        # Create email log
-        email_log = EmailLog(
-            campaign_id=campaign_id,
-            lead_id=lead_id,
-            status="sent"
-        )
-        log_dict = email_log.model_dump()
-        log_dict['sent_at'] = log_dict['sent_at'].isoformat()
-        await db.email_logs.insert_one(log_dict)
+@api_router.post("/campaigns/{campaign_id}/start")
+async def start_campaign(campaign_id: str, request: StartCampaignRequest, current_user: dict = Depends(get_current_user)):
+    """Starts sending a draft campaign"""
+    query = {"id": campaign_id, "user_id": current_user['user_id']}
+    campaign = await db.campaigns.find_one_and_update(
+        {**query, "status": "draft"}, {"$set": {"status": "running"}}, projection={"_id": 0, "id": 1}
+    )
+    if campaign is None:
+        if await db.campaigns.find_one(query, {"_id": 1}):
+            raise HTTPException(status_code=409, detail="Only draft campaigns can be started")
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    await touch_user_data(current_user['user_id'])
+    await enqueue_job("send_campaign", {"campaign_id": campaign_id, "concurrency": request.concurrency})
+    return {"campaign_id": campaign_id, "status": "started"}
+
+class CampaignBookkeeper:
+    """Collects each sent email and writes them in batches: email logs with insert_many,
+    one merged counter $inc on the campaign, one update_many for lead statuses and one
+    rollup bulk_write per flush. Opens and clicks arrive later through tracking_buffer."""
+
+    def __init__(self, campaign_doc: Dict[str, Any], batch_size: int = EMAIL_BOOKKEEPING_BATCH_SIZE,
+                 flush_interval: float = EMAIL_BOOKKEEPING_FLUSH_INTERVAL, on_flush=None):
+        self.campaign_id = campaign_doc['id']
+        self.user_id = campaign_doc['user_id']
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush  # async callback receiving {"sent"} after each flush
+        self.sent = 0
+        self.logs: List[Dict[str, Any]] = []
+        self.last_flush = time.monotonic()
+
+    async def record(self, lead_id: str, log_id: str):
+        now = datetime.now(timezone.utc)
+        log = {
+            "id": log_id,
+            "campaign_id": self.campaign_id,
+            "lead_id": lead_id,
+            "status": "sent",
+            "sent_at": now,
+            "opened_at": None,
+            "clicked_at": None,
+            "replied_at": None,
+        }
+        self.logs.append(log)
+        if len(self.logs) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        # Take the batch before the first await so concurrent workers start a new one
+        logs, self.logs = self.logs, []
+        self.last_flush = time.monotonic()
+        if not logs:
+            return
+        lead_ids = [log['lead_id'] for log in logs]
+        increments = {}
+        for log in logs:
+            add_rollup_increments(increments, self.user_id, rollup_day(log['sent_at']), emails_sent=1)
         
-        # Simulate some opens and clicks
-        if random.random() > 0.4:  # 60% open rate
-            await db.email_logs.update_one(
-                {"id": email_log.id},
-                {"$set": {"status": "opened", "opened_at": datetime.now(timezone.utc).isoformat()}}
-            )
-            await db.campaigns.update_one({"id": campaign_id}, {"$inc": {"opened_count": 1}})
-            
-            if random.random() > 0.7:  # 30% click rate
-                await db.email_logs.update_one(
-                    {"id": email_log.id},
-                    {"$set": {"clicked_at": datetime.now(timezone.utc).isoformat()}}
-                )
-                await db.campaigns.update_one({"id": campaign_id}, {"$inc": {"clicked_count": 1}})
+        await db.email_logs.insert_many(logs, ordered=False)
         
-        # Update lead status
-        await db.leads.update_one(
-            {"id": lead_id},
-            {"$set": {"status": "Emailed", "last_activity": datetime.now(timezone.utc).isoformat()}}
+        # Leads changing status, read first so the status rollups can be moved
+        changing = await db.leads.find(
+            {"id": {"$in": lead_ids}, "user_id": self.user_id, "status": {"$ne": "Emailed"}}, ROLLUP_LEAD_FIELDS
+        ).to_list(len(lead_ids))
+        await db.leads.update_many(
+            {"id": {"$in": lead_ids}, "user_id": self.user_id},
+            {"$set": {"status": "Emailed", "last_activity": datetime.now(timezone.utc)}}
         )
+        for lead in changing:
+            add_status_rollup(increments, lead, "Emailed")
         
-        # Update campaign progress
         await db.campaigns.update_one(
-            {"id": campaign_id},
-            {"$inc": {"sent_count": 1}}
+            {"id": self.campaign_id},
+            {"$inc": {"sent_count": len(logs)}}
         )
+        await apply_rollup_increments(increments)
+        await touch_user_data(self.user_id)
+        self.sent += len(logs)
+        if self.on_flush is not None:
+            await self.on_flush({"sent": self.sent})
+
+async def simulate_email_sending(campaign_id: str, concurrency: Optional[int] = None, ctx: Optional["JobContext"] = None):
+    """Sends a campaign through a pool of workers, rate limited per sender mailbox and
+    per recipient domain. The campaign is paused if every mailbox runs out of daily quota.
+
+    Leads that already have an email log for the campaign are skipped, so a retried or
+    resumed run never sends to them again; emails sent but not yet written when a
+    previous run died are sent again. Leads that were deleted, have no email or belong
+    to another user are skipped and counted in the campaign's skipped_count."""
+    campaign_doc = await db.campaigns.find_one({"id": campaign_id})
+    already_sent = set(await db.email_logs.distinct("lead_id", {"campaign_id": campaign_id}))
+    lead_ids = [lead_id for lead_id in campaign_doc['lead_ids'] if lead_id not in already_sent]
+    workers = min(concurrency or SEND_CONCURRENCY, SEND_MAX_CONCURRENCY, max(1, len(lead_ids)))
+    mailboxes = await load_sender_mailboxes(campaign_doc['user_id'])
+    state = {"next": 0, "exhausted": False, "skipped": 0}
+    bookkeeper = CampaignBookkeeper(campaign_doc, on_flush=ctx.checkpoint if ctx else None)
+    bookkeeper.sent = len(already_sent)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 4)
+    
+    async def produce():
+        for i in range(0, len(lead_ids), 200):
+            chunk = lead_ids[i:i + 200]
+            leads = await db.leads.find(
+                {"id": {"$in": chunk}, "user_id": campaign_doc['user_id']}, {"_id": 0, "id": 1, "email": 1}
+            ).to_list(len(chunk))
+            emails = {lead['id']: lead['email'] for lead in leads if lead.get('email')}
+            state['skipped'] += len(chunk) - len(emails)
+            personalised = {
+                p['lead_id']: p for p in await db.campaign_personalisations.find(
+                    {"campaign_id": campaign_id, "lead_id": {"$in": chunk}}, {"_id": 0}
+                ).to_list(len(chunk))
+            }
+            for lead_id in chunk:
+                if lead_id in emails:
+                    await queue.put((lead_id, emails[lead_id], personalised.get(lead_id)))
+        for _ in range(workers):
+            await queue.put(None)
+    
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if state['exhausted']:
+                continue
+            lead_id, recipient, personalised = item
+            subject = personalised['subject'] if personalised else campaign_doc['subject']
+            body = personalised['body'] if personalised else campaign_doc['body']
+            mailbox = await next_mailbox(mailboxes, state)
+            if mailbox is None:
+                state['exhausted'] = True
+                continue
+            await get_mailbox_bucket(mailbox).acquire()
+            await get_domain_bucket(recipient.rsplit('@', 1)[-1].lower()).acquire()
+            log_id = str(uuid.uuid4())
+            try:
+                await email_transport.send(mailbox, recipient, subject, render_tracked_html(body, log_id), log_id)
+            except Exception as e:
+                logging.error(f"Sending to lead {lead_id} in campaign {campaign_id} failed: {str(e)}")
+                if mailbox['metered']:
+                    await release_mailbox_send(mailbox['id'])
+                continue
+            await bookkeeper.record(lead_id, log_id)
+    
+    await asyncio.gather(produce(), *(work() for _ in range(workers)))
+    await bookkeeper.flush()
     
-    # Mark campaign as completed
+    # Mark campaign as completed, or paused when the sending quota ran out
+    final_status = "paused" if state['exhausted'] else "completed"
     await db.campaigns.update_one(
         {"id": campaign_id},
-        {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": final_status, "completed_at": datetime.now(timezone.utc),
+                  "skipped_count": state['skipped']}}
     )
+    await touch_user_data(campaign_doc['user_id'])
 
 @api_router.get("/campaigns")
-async def get_campaigns(current_user: dict = Depends(get_current_user)):
+async def get_campaigns(
+    fields: Optional[str] = None, etag: str = Depends(user_data_etag), current_user: dict = Depends(get_current_user)
+):
+    """Lists campaigns newest first; without fields= the lead_ids and body are left out"""
     user_id = current_user['user_id']
-    campaigns = await db.campaigns.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return campaigns
+    projection = field_projection(fields, CAMPAIGN_FIELDS, CAMPAIGN_SUMMARY_FIELDS)
+    campaigns = await db.campaigns.find({"user_id": user_id}, projection).sort("created_at", -1).to_list(100)
+    return FastJSONResponse(campaigns, headers=etag_headers(etag))
 
 @api_router.get("/campaigns/{campaign_id}")
 async def get_campaign(campaign_id: str, current_user: dict = Depends(get_current_user)):
@@ -480,12 +2478,295 @@ async def delete_campaign(campaign_id: str, current_user: dict = Depends(get_cur
     result = await db.campaigns.delete_one({"id": campaign_id, "user_id": current_user['user_id']})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Campaign not found")
+    await db.campaign_personalisations.delete_many({"campaign_id": campaign_id})
+    await remove_campaign_rollups(campaign_id, current_user['user_id'])
+    await touch_user_data(current_user['user_id'])
     return {"message": "Campaign deleted successfully"}
 
+# ============= BACKGROUND JOBS =============
+# Scraping and sending run from a job queue in Mongo (background_jobs). A worker claims
+# a job by taking a lease, renews it with heartbeats while the job runs and stores
+# checkpoints as it goes; a job whose lease expires (worker crashed or restarted) is
+# claimed again and its handler resumes from the last checkpoint. A job whose handler
+# raised is queued again with not_before pushed back exponentially, so a short outage
+# does not use up all JOB_MAX_ATTEMPTS at once.
+async def enqueue_job(job_type: str, payload: Dict[str, Any]) -> str:
+    now = datetime.now(timezone.utc)
+    job_id = str(uuid.uuid4())
+    await db.background_jobs.insert_one({
+        "id": job_id,
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",  # queued, running, completed, failed
+        "attempts": 0,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "checkpoint": None,
+        "error": None,
+        "not_before": None,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return job_id
+
+class JobContext:
+    """Handed to job handlers so they can persist checkpoints under the worker's lease"""
+
+    def __init__(self, job: Dict[str, Any], worker_id: str):
+        self.job = job
+        self.worker_id = worker_id
+        self.checkpoint_data: Dict[str, Any] = job.get('checkpoint') or {}
+
+    async def checkpoint(self, data: Dict[str, Any]):
+        self.checkpoint_data = data
+        await db.background_jobs.update_one(
+            {"id": self.job['id'], "lease_owner": self.worker_id},
+            {"$set": {"checkpoint": data, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+async def run_scrape_job(payload: Dict[str, Any], ctx: JobContext):
+    await simulate_scraping(payload['job_id'], payload['user_id'], ctx)
+
+async def run_send_campaign_job(payload: Dict[str, Any], ctx: JobContext):
+    await simulate_email_sending(payload['campaign_id'], payload.get('concurrency'), ctx)
+
+async def fail_scrape_job(payload: Dict[str, Any]):
+    failed = {"status": "failed", "completed_at": datetime.now(timezone.utc)}
+    await db.scraping_jobs.update_one({"id": payload['job_id']}, {"$set": failed})
+    await touch_user_data(payload['user_id'])
+    progress_broker.publish(payload['job_id'], failed)
+
+async def fail_send_campaign_job(payload: Dict[str, Any]):
+    campaign = await db.campaigns.find_one_and_update(
+        {"id": payload['campaign_id']}, {"$set": {"status": "failed"}}, projection={"_id": 0, "user_id": 1}
+    )
+    if campaign:
+        await touch_user_data(campaign['user_id'])
+
+# job type -> (handler, called once the job has failed for good)
+JOB_HANDLERS = {
+    "scrape": (run_scrape_job, fail_scrape_job),
+    "send_campaign": (run_send_campaign_job, fail_send_campaign_job),
+    "bulk_leads": (run_bulk_leads_job, fail_bulk_leads_job),
+}
+
+class JobRunner:
+    """Claims and runs background jobs, up to concurrency at a time"""
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = False
+
+    async def run(self):
+        logging.info(f"Job worker {self.worker_id} started with concurrency {self.concurrency}")
+        await asyncio.gather(*(self.claim_loop() for _ in range(self.concurrency)))
+
+    async def claim_loop(self):
+        while not self.stopping:
+            try:
+                await self.fail_abandoned()
+                job = await self.claim()
+            except Exception as e:
+                logging.error(f"Job claim failed: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            await self.execute(job)
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await db.background_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "not_before": {"$not": {"$gt": now}}},
+                {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$lt": JOB_MAX_ATTEMPTS}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_owner": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            projection={"_id": 0},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_abandoned(self):
+        """Fails jobs whose lease expired on their last attempt, e.g. because they keep
+        crashing the worker process, so they are not claimed again forever"""
+        while True:
+            now = datetime.now(timezone.utc)
+            job = await db.background_jobs.find_one_and_update(
+                {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+                {"$set": {
+                    "status": "failed",
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                    "error": "Lease expired on the last attempt",
+                    "updated_at": now,
+                }},
+                projection={"_id": 0, "id": 1, "type": 1, "payload": 1},
+            )
+            if job is None:
+                return
+            logging.error(f"Job {job['id']} ({job['type']}) failed: lease expired on the last attempt")
+            await JOB_HANDLERS[job['type']][1](job['payload'])
+
+    async def heartbeat(self, job: Dict[str, Any], task: asyncio.Task, lease: Dict[str, bool]):
+        while not task.done():
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            now = datetime.now(timezone.utc)
+            result = await db.background_jobs.update_one(
+                {"id": job['id'], "lease_owner": self.worker_id},
+                {"$set": {
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                }}
+            )
+            if result.matched_count == 0:
+                logging.warning(f"Lost lease on job {job['id']}, stopping it")
+                lease['lost'] = True
+                task.cancel()
+                return
+
+    async def execute(self, job: Dict[str, Any]):
+        handler, on_failure = JOB_HANDLERS[job['type']]
+        task = asyncio.create_task(handler(job['payload'], JobContext(job, self.worker_id)))
+        lease = {"lost": False}
+        heartbeat = asyncio.create_task(self.heartbeat(job, task, lease))
+        owned = {"id": job['id'], "lease_owner": self.worker_id}
+        try:
+            await task
+        except asyncio.CancelledError:
+            if lease['lost']:
+                return  # Whoever holds the lease now owns the job
+            # The worker itself is shutting down: hand the job back without using up an attempt
+            task.cancel()
+            await db.background_jobs.update_one(owned, {
+                "$set": {"status": "queued", "lease_owner": None, "lease_expires_at": None,
+                         "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"attempts": -1},
+            })
+            raise
+        except Exception as e:
+            logging.error(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}: {str(e)}")
+            final = job['attempts'] >= JOB_MAX_ATTEMPTS
+            now = datetime.now(timezone.utc)
+            delay = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (job['attempts'] - 1))
+            await db.background_jobs.update_one(owned, {"$set": {
+                "status": "failed" if final else "queued",
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "not_before": None if final else now + timedelta(seconds=delay),
+                "error": str(e),
+                "updated_at": now,
+            }})
+            if final:
+                await on_failure(job['payload'])
+            return
+        finally:
+            heartbeat.cancel()
+        await db.background_jobs.update_one(owned, {"$set": {
+            "status": "completed",
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": datetime.now(timezone.utc),
+        }})
+
+job_runner: Optional[JobRunner] = None
+
+# ============= TRACKING ROUTES =============
+# Unauthenticated: these URLs are embedded in sent emails. They never touch the
+# database on the request path; events are written by tracking_buffer.
+@api_router.get("/t/open/{log_id}.gif")
+async def track_open(log_id: str):
+    tracking_buffer.record(log_id, "open")
+    return Response(
+        content=TRACKING_PIXEL,
+        media_type="image/gif",
+        headers={"Cache-Control": "no-store, no-cache, must-revalidate, max-age=0"},
+    )
+
+@api_router.get("/t/click/{log_id}")
+async def track_click(log_id: str, url: str, sig: str):
+    if not hmac.compare_digest(sig, tracking_signature(log_id, url)):
+        raise HTTPException(status_code=400, detail="Invalid tracking link")
+    tracking_buffer.record(log_id, "click")
+    return RedirectResponse(url, status_code=302)
+
+# ============= SETTINGS ROUTES =============
+@api_router.get("/settings/email-accounts")
+async def get_email_accounts(current_user: dict = Depends(get_current_user)):
+    accounts = await db.email_accounts.find(
+        {"user_id": current_user['user_id']}, {"_id": 0}
+    ).sort("created_at", 1).to_list(100)
+    return FastJSONResponse(accounts)
+
+@api_router.post("/settings/email-accounts")
+async def create_email_account(request: EmailAccountRequest, current_user: dict = Depends(get_current_user)):
+    user_id = current_user['user_id']
+    account = EmailAccount(
+        user_id=user_id,
+        email=request.email,
+        type=request.type,
+        sender_name=request.sender_name,
+        daily_limit=request.daily_limit,
+        rate_per_minute=request.rate_per_minute,
+        smtp_config={k: v for k, v in request.smtp_config.items() if k != 'password'},
+        is_primary=await db.email_accounts.count_documents({"user_id": user_id}) == 0
+    )
+    account_dict = account.model_dump()
+    await db.email_accounts.insert_one(account_dict)
+    account_dict.pop('_id', None)
+    return account_dict
+
+@api_router.put("/settings/email-accounts/{account_id}")
+async def update_email_account(account_id: str, updates: EmailAccountUpdate, current_user: dict = Depends(get_current_user)):
+    user_id = current_user['user_id']
+    changes = updates.model_dump(exclude_none=True)
+    if changes.get('is_primary'):
+        await db.email_accounts.update_many({"user_id": user_id}, {"$set": {"is_primary": False}})
+    result = await db.email_accounts.update_one({"id": account_id, "user_id": user_id}, {"$set": changes})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Email account not found")
+    return {"message": "Email account updated successfully"}
+
+@api_router.delete("/settings/email-accounts/{account_id}")
+async def delete_email_account(account_id: str, current_user: dict = Depends(get_current_user)):
+    result = await db.email_accounts.delete_one({"id": account_id, "user_id": current_user['user_id']})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Email account not found")
+    mailbox_buckets.pop(account_id, None)
+    return {"message": "Email account deleted successfully"}
+
 # ============= AI ROUTES =============
-@api_router.post("/ai/generate-follow-up")
-async def generate_follow_up(request: AIGenerateRequest, current_user: dict = Depends(get_current_user)):
-    try:
+ai_response_cache = TTLCache(AI_CACHE_SIZE, AI_CACHE_TTL)
+ai_inflight: Dict[tuple, asyncio.Task] = {}  # cache key -> generation shared by concurrent identical requests
+ai_coalesced = 0
+
+def normalize_prompt_input(value: str) -> str:
+    return ' '.join(value.split()).casefold()
+
+def follow_up_fallback(lead_name: str, business_name: str) -> Dict[str, str]:
+    return {
+        "subject": f"Following up on our conversation, {lead_name}",
+        "body": f"Hi {lead_name},\n\nI wanted to follow up on my previous email regarding {business_name}. I believe our services could be valuable to your business.\n\nWould you have 15 minutes this week for a quick call?\n\nBest regards"
+    }
+
+class EmergentLLMBackend:
+    """GPT-4o through the Emergent integration"""
+
+    def config_error(self) -> Optional[str]:
+        if not os.environ.get('EMERGENT_LLM_KEY'):
+            return "LLM_BACKEND is emergent but EMERGENT_LLM_KEY is not set; AI generation will fail"
+        return None
+
+    async def complete(self, system_message: str, prompt: str, session_id: str) -> str:
         # Get API key from environment
         api_key = os.environ.get('EMERGENT_LLM_KEY')
         if not api_key:
@@ -494,15 +2775,90 @@ async def generate_follow_up(request: AIGenerateRequest, current_user: dict = De
         # Create chat instance
         chat = LlmChat(
             api_key=api_key,
-            session_id=f"follow_up_{current_user['user_id']}",
-            system_message=f"You are an expert email copywriter. Generate compelling follow-up emails in a {request.tone} tone."
+            session_id=session_id,
+            system_message=system_message
         ).with_model("openai", "gpt-4o")
-        
-        # Generate follow-up
-        prompt = f"""Generate a follow-up email for:
-Business: {request.business_name}
-Contact: {request.lead_name}
-Tone: {request.tone}
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def stream(self, system_message: str, prompt: str, session_id: str) -> AsyncIterator[str]:
+        # LlmChat only returns whole completions, so the reply arrives as a single chunk;
+        # use the openai backend for token streaming
+        yield await self.complete(system_message, prompt, session_id)
+
+class OpenAILLMBackend:
+    """OpenAI chat completions, streamed token by token. One client, and so one pool of
+    HTTP connections, is shared by every request."""
+
+    def __init__(self):
+        self.client: Optional[AsyncOpenAI] = None
+
+    def config_error(self) -> Optional[str]:
+        if not os.environ.get('OPENAI_API_KEY'):
+            return ("LLM_BACKEND is openai but OPENAI_API_KEY is not set; AI generation will fail. "
+                    "Set OPENAI_API_KEY, or LLM_BACKEND=emergent to use EMERGENT_LLM_KEY")
+        return None
+
+    def get_client(self) -> AsyncOpenAI:
+        if self.client is None:
+            api_key = os.environ.get('OPENAI_API_KEY')
+            if not api_key:
+                raise HTTPException(status_code=500, detail="AI service not configured")
+            self.client = AsyncOpenAI(api_key=api_key, base_url=os.environ.get('OPENAI_BASE_URL') or None)
+        return self.client
+
+    def messages(self, system_message: str, prompt: str) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": system_message}, {"role": "user", "content": prompt}]
+
+    async def complete(self, system_message: str, prompt: str, session_id: str) -> str:
+        response = await self.get_client().chat.completions.create(
+            model=OPENAI_MODEL, messages=self.messages(system_message, prompt)
+        )
+        return response.choices[0].message.content or ""
+
+    async def stream(self, system_message: str, prompt: str, session_id: str) -> AsyncIterator[str]:
+        stream = await self.get_client().chat.completions.create(
+            model=OPENAI_MODEL, messages=self.messages(system_message, prompt), stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class FakeLLMBackend:
+    """Deterministic offline stand-in: the same prompt always yields the same email"""
+
+    def config_error(self) -> Optional[str]:
+        return None
+
+    async def complete(self, system_message: str, prompt: str, session_id: str) -> str:
+        fields = dict(line.split(': ', 1) for line in prompt.splitlines() if ': ' in line)
+        business = fields.get('Business', 'your business')
+        contact = fields.get('Contact', 'there')
+        variant = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % 3
+        openers = ["Quick follow-up", "Circling back", "One more idea"]
+        return (
+            f"SUBJECT: {openers[variant]} for {business}\n"
+            f"BODY: Hi {contact},\n\nI wanted to follow up about {business}. "
+            f"We help teams like yours win more customers.\n\nWould a short call this week work?\n\nBest regards"
+        )
+
+    async def stream(self, system_message: str, prompt: str, session_id: str) -> AsyncIterator[str]:
+        response = await self.complete(system_message, prompt, session_id)
+        for token in re.findall(r'\S+\s*', response):
+            await asyncio.sleep(0.01)
+            yield token
+
+LLM_BACKENDS = {"emergent": EmergentLLMBackend, "openai": OpenAILLMBackend, "fake": FakeLLMBackend}
+if LLM_BACKEND not in LLM_BACKENDS:
+    message = f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected one of: {', '.join(LLM_BACKENDS)}"
+    logging.error(message)
+    raise RuntimeError(message)
+llm_backend = LLM_BACKENDS[LLM_BACKEND]()
+
+def follow_up_prompt(lead_name: str, business_name: str, tone: str) -> str:
+    return f"""Generate a follow-up email for:
+Business: {business_name}
+Contact: {lead_name}
+Tone: {tone}
 
 Provide:
 1. Subject line
@@ -511,149 +2867,382 @@ Provide:
 Format as:
 SUBJECT: [subject]
 BODY: [body]"""
-        
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
-        
-        # Parse response
-        lines = response.strip().split('\n')
-        subject = ""
-        body = ""
-        body_started = False
-        
+
+def follow_up_line(parsed: Dict[str, Any], line: str):
+    """Applies one line of a SUBJECT:/BODY: reply to parsed (subject, body, in_body)"""
+    if line.startswith('SUBJECT:'):
+        parsed['subject'] = line.replace('SUBJECT:', '').strip()
+    elif line.startswith('BODY:'):
+        parsed['body'] = line.replace('BODY:', '').strip()
+        parsed['in_body'] = True
+    elif parsed['in_body']:
+        parsed['body'] += '\n' + line
+
+def parse_follow_up(response: str) -> Dict[str, str]:
+    parsed = {"subject": "", "body": "", "in_body": False}
+    for line in response.strip().split('\n'):
+        follow_up_line(parsed, line)
+    return {"subject": parsed['subject'], "body": parsed['body'].strip()}
+
+class FollowUpStreamParser:
+    """Incremental version of parse_follow_up. feed() takes raw chunks and returns
+    ("subject", text) each time a SUBJECT: line completes and ("body", delta) as body
+    text arrives; result() always equals parse_follow_up of everything fed.
+
+    Body text is held back while it could still change: trailing whitespace, and a line
+    start that may yet turn out to be SUBJECT: or BODY:. The deltas add up to the final
+    body unless the reply starts the body over with a second BODY: line, in which case
+    only result() is right."""
+
+    def __init__(self):
+        self.text = ""  # Everything fed, without leading whitespace as parse_follow_up strips it
+        self.consumed = 0  # Length of text already applied as complete lines
+        self.parsed = {"subject": "", "body": "", "in_body": False}
+        self.sent_body = ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.text = self.text + chunk if self.text else chunk.lstrip()
+        events = []
+        *lines, partial = self.text[self.consumed:].split('\n')
         for line in lines:
+            self.consumed += len(line) + 1
+            follow_up_line(self.parsed, line)
             if line.startswith('SUBJECT:'):
-                subject = line.replace('SUBJECT:', '').strip()
-            elif line.startswith('BODY:'):
-                body = line.replace('BODY:', '').strip()
-                body_started = True
-            elif body_started:
-                body += '\n' + line
-        
-        return {"subject": subject, "body": body.strip()}
+                events.append(("subject", self.parsed['subject']))
+        body = self.preview_body(partial)
+        if body is not None and len(body) > len(self.sent_body) and body.startswith(self.sent_body):
+            events.append(("body", body[len(self.sent_body):]))
+            self.sent_body = body
+        return events
+
+    def preview_body(self, partial: str) -> Optional[str]:
+        """The body so far, counting the unfinished last line where it is already certain"""
+        if partial.startswith('BODY:'):
+            for size in range(len('BODY:') - 1, 0, -1):
+                if partial.endswith('BODY:'[:size]):  # May still become another BODY: to remove
+                    partial = partial[:-size]
+                    break
+            return partial.replace('BODY:', '').strip()
+        if not self.parsed['in_body']:
+            return None
+        if partial.startswith('SUBJECT:') or 'SUBJECT:'.startswith(partial) or 'BODY:'.startswith(partial):
+            return self.parsed['body'].strip()
+        return (self.parsed['body'] + '\n' + partial).strip()
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """Events for whatever was still held back once the reply has ended"""
+        events = []
+        if self.text[self.consumed:].startswith('SUBJECT:'):
+            events.append(("subject", self.result()['subject']))
+        body = self.result()['body']
+        if len(body) > len(self.sent_body) and body.startswith(self.sent_body):
+            events.append(("body", body[len(self.sent_body):]))
+            self.sent_body = body
+        return events
+
+    def result(self) -> Dict[str, str]:
+        return parse_follow_up(self.text)
+
+def follow_up_stream_event(kind: str, text: str) -> str:
+    if kind == "subject":
+        return format_sse("subject", {"type": "subject", "subject": text})
+    return format_sse("body", {"type": "body", "delta": text})
+
+def follow_up_system_message(tone: str) -> str:
+    return f"You are an expert email copywriter. Generate compelling follow-up emails in a {tone} tone."
+
+async def generate_follow_up_email(lead_name: str, business_name: str, tone: str, session_id: str) -> Dict[str, str]:
+    """Asks the configured LLM backend for a follow-up email and parses the SUBJECT:/BODY: reply"""
+    response = await llm_backend.complete(follow_up_system_message(tone), follow_up_prompt(lead_name, business_name, tone), session_id)
+    return parse_follow_up(response)
+
+def follow_up_cache_key(lead_name: str, business_name: str, tone: str) -> Tuple[str, ...]:
+    return ("follow_up", normalize_prompt_input(business_name), normalize_prompt_input(lead_name), normalize_prompt_input(tone))
+
+def follow_up_session_id(key: Tuple[str, ...]) -> str:
+    return "follow_up_" + hashlib.sha256('|'.join(key).encode('utf-8')).hexdigest()[:16]
+
+async def cached_follow_up(lead_name: str, business_name: str, tone: str) -> Dict[str, str]:
+    """Returns a cached follow-up for these inputs, joins an identical generation already
+    in flight, or starts one. Only successful generations are cached."""
+    global ai_coalesced
+    key = follow_up_cache_key(lead_name, business_name, tone)
+    cached = ai_response_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    task = ai_inflight.get(key)
+    if task is None:
+        async def generate():
+            result = await generate_follow_up_email(lead_name, business_name, tone, follow_up_session_id(key))
+            ai_response_cache.set(key, result)
+            return result
+        task = asyncio.create_task(generate())
+        ai_inflight[key] = task
+        task.add_done_callback(lambda _: ai_inflight.pop(key, None))
+    else:
+        ai_coalesced += 1
+    # Shielded so one client disconnecting does not cancel the generation for the others
+    return await asyncio.shield(task)
+
+def ai_cache_stats() -> Dict[str, Any]:
+    return {**ai_response_cache.stats(), "coalesced": ai_coalesced, "in_flight": len(ai_inflight)}
+
+async def follow_up_with_retry(lead_name: str, business_name: str, tone: str) -> Dict[str, str]:
+    for attempt in range(1, AI_BATCH_MAX_ATTEMPTS + 1):
+        try:
+            return await cached_follow_up(lead_name, business_name, tone)
+        except Exception:
+            if attempt == AI_BATCH_MAX_ATTEMPTS:
+                raise
+            await asyncio.sleep(AI_BATCH_RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.8, 1.2))
+
+@api_router.post("/ai/generate-follow-up")
+async def generate_follow_up(request: AIGenerateRequest, current_user: dict = Depends(get_current_user)):
+    try:
+        return await cached_follow_up(request.lead_name, request.business_name, request.tone)
     except Exception as e:
         logging.error(f"AI generation error: {str(e)}")
-        return {
-            "subject": f"Following up on our conversation, {request.lead_name}",
-            "body": f"Hi {request.lead_name},\n\nI wanted to follow up on my previous email regarding {request.business_name}. I believe our services could be valuable to your business.\n\nWould you have 15 minutes this week for a quick call?\n\nBest regards"
-        }
+        return follow_up_fallback(request.lead_name, request.business_name)
 
-# ============= ANALYTICS ROUTES =============
-@api_router.get("/analytics/dashboard")
-async def get_dashboard_analytics(current_user: dict = Depends(get_current_user)):
+@api_router.post("/ai/generate-follow-up/stream")
+async def stream_follow_up(request: AIGenerateRequest, current_user: dict = Depends(get_current_user)):
+    """Server-sent events version of generate-follow-up: a "subject" event once the subject
+    line is complete, "body" events carrying each new piece of body text, then "done" with
+    the full email. A cached email is replayed immediately."""
+    key = follow_up_cache_key(request.lead_name, request.business_name, request.tone)
+    
+    async def events():
+        cached = ai_response_cache.get(key)
+        if cached is not None:
+            yield format_sse("subject", {"type": "subject", "subject": cached['subject']})
+            yield format_sse("body", {"type": "body", "delta": cached['body']})
+            yield format_sse("done", {"type": "done", **cached})
+            return
+        
+        parser = FollowUpStreamParser()
+        try:
+            async for chunk in llm_backend.stream(
+                follow_up_system_message(request.tone),
+                follow_up_prompt(request.lead_name, request.business_name, request.tone),
+                follow_up_session_id(key)
+            ):
+                for kind, text in parser.feed(chunk):
+                    yield follow_up_stream_event(kind, text)
+            for kind, text in parser.finish():
+                yield follow_up_stream_event(kind, text)
+            result = parser.result()
+            ai_response_cache.set(key, result)
+        except Exception as e:
+            logging.error(f"AI generation error: {str(e)}")
+            result = follow_up_fallback(request.lead_name, request.business_name)
+            yield format_sse("error", {"type": "error", "detail": "Generation failed, using the default template"})
+        yield format_sse("done", {"type": "done", **result})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/ai/generate-batch")
+async def generate_follow_up_batch(request: AIBatchGenerateRequest, current_user: dict = Depends(get_current_user)):
+    """Generates a follow-up per lead with bounded concurrency, streaming each result as
+    soon as it is ready (NDJSON lines or SSE events). With campaign_id, which must be a
+    draft (created with start=false), the results are stored in campaign_personalisations
+    and used once the campaign is started with /campaigns/{id}/start."""
+    if request.format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or sse")
     user_id = current_user['user_id']
+    lead_ids = list(dict.fromkeys(request.lead_ids))
+    if request.campaign_id:
+        campaign = await db.campaigns.find_one(
+            {"id": request.campaign_id, "user_id": user_id}, {"_id": 0, "lead_ids": 1, "status": 1}
+        )
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        if campaign['status'] != "draft":
+            # Sending reads personalisations as it goes, so later results would be ignored
+            raise HTTPException(status_code=409, detail="Only draft campaigns can be personalised")
+        lead_ids = lead_ids or campaign['lead_ids']
+    if not lead_ids:
+        raise HTTPException(status_code=400, detail="Provide lead_ids or a campaign_id")
+    if len(lead_ids) > AI_BATCH_MAX_LEADS:
+        raise HTTPException(status_code=400, detail=f"At most {AI_BATCH_MAX_LEADS} leads per batch")
     
-    # Get counts
-    total_leads = await db.leads.count_documents({"user_id": user_id})
-    total_campaigns = await db.campaigns.count_documents({"user_id": user_id})
+    leads = await db.leads.find(
+        {"id": {"$in": lead_ids}, "user_id": user_id}, {"_id": 0, "id": 1, "business_name": 1}
+    ).to_list(len(lead_ids))
+    slots = asyncio.Semaphore(AI_BATCH_CONCURRENCY)
     
-    # Get campaign stats
-    campaigns = await db.campaigns.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-    total_emails_sent = sum(c.get('sent_count', 0) for c in campaigns)
-    total_opens = sum(c.get('opened_count', 0) for c in campaigns)
-    total_replies = sum(c.get('replied_count', 0) for c in campaigns)
+    async def personalise(lead: Dict[str, Any]) -> Dict[str, Any]:
+        async with slots:
+            try:
+                email = await follow_up_with_retry(request.lead_name, lead['business_name'], request.tone)
+            except Exception as e:
+                return {"lead_id": lead['id'], "error": str(e)}
+        if request.campaign_id:
+            await db.campaign_personalisations.update_one(
+                {"campaign_id": request.campaign_id, "lead_id": lead['id']},
+                {"$set": {**email, "created_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        return {"lead_id": lead['id'], **email}
     
-    open_rate = (total_opens / total_emails_sent * 100) if total_emails_sent > 0 else 0
-    reply_rate = (total_replies / total_emails_sent * 100) if total_emails_sent > 0 else 0
+    def encode(result: Dict[str, Any]) -> str:
+        if request.format == "sse":
+            return format_sse("error" if "error" in result else "result", result)
+        return json.dumps(result) + "\n"
     
-    # Get leads over time (last 7 days)
-    leads_by_date = {}
-    for i in range(6, -1, -1):
-        date = (datetime.now(timezone.utc) - timedelta(days=i)).strftime('%Y-%m-%d')
-        leads_by_date[date] = 0
+    async def results():
+        found = {lead['id'] for lead in leads}
+        for lead_id in lead_ids:
+            if lead_id not in found:
+                yield encode({"lead_id": lead_id, "error": "Lead not found"})
+        tasks = [asyncio.create_task(personalise(lead)) for lead in leads]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield encode(await next_done)
+            if request.format == "sse":
+                yield format_sse("done", {"total": len(lead_ids)})
+        finally:
+            for task in tasks:
+                task.cancel()
     
-    all_leads = await db.leads.find({"user_id": user_id}, {"_id": 0, "created_at": 1}).to_list(10000)
-    for lead in all_leads:
-        date_str = lead['created_at'][:10]
-        if date_str in leads_by_date:
-            leads_by_date[date_str] += 1
+    return StreamingResponse(
+        results(),
+        media_type="text/event-stream" if request.format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ============= ANALYTICS ROUTES =============
+# Every analytics endpoint takes optional from/to bounds (YYYY-MM-DD or ISO datetime,
+# inclusive); rollups are daily, so the bounds are applied as whole UTC days.
+def analytics_range(date_from: Optional[str], date_to: Optional[str]):
+    """Returns the (start, end) datetimes and the matching first/last rollup days"""
+    start, end = date_range(date_from, date_to)
+    return start, end, start and rollup_day(start), end and rollup_day(end)
+
+@api_router.get("/analytics/dashboard")
+async def get_dashboard_analytics(
+    days: int = 7,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    etag: str = Depends(user_data_etag),
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user['user_id']
+    days = max(1, min(days, 365))
+    cache_name = f"dashboard:{days}:{date_from}:{date_to}:{etag}"
+    cached = analytics_cache.get((user_id, cache_name))
+    if cached is not None:
+        return cached
     
-    # Recent activity
-    recent_campaigns = await db.campaigns.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
+    # Requested range, oldest first, including days without leads
+    start, end, first_day, last_day = analytics_range(date_from, date_to)
+    last = end or datetime.now(timezone.utc)
+    first = start or last - timedelta(days=days - 1)
+    span = (last.date() - first.date()).days + 1
+    if span < 1:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if span > 366:
+        raise HTTPException(status_code=400, detail="The date range may span at most 366 days")
+    dates = [(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(span)]
     
-    # Get leads by source for pie chart
-    leads_by_source = {}
-    for lead in all_leads:
-        source = lead.get('source', 'Unknown')
-        leads_by_source[source] = leads_by_source.get(source, 0) + 1
+    stats, total_campaigns, recent_campaigns = await asyncio.gather(
+        rollup_stats(user_id, dates[0], first_day, last_day),
+        db.campaigns.count_documents({"user_id": user_id, **date_range_filter("created_at", start, end)}),
+        db.campaigns.find(
+            {"user_id": user_id}, field_projection(None, CAMPAIGN_FIELDS, CAMPAIGN_SUMMARY_FIELDS)
+        ).sort("created_at", -1).limit(5).to_list(5),
+    )
     
-    return {
-        "total_leads": total_leads,
+    data = {
+        "total_leads": stats['total_leads'],
         "active_campaigns": total_campaigns,
-        "emails_sent": total_emails_sent,
-        "open_rate": round(open_rate, 1),
-        "reply_rate": round(reply_rate, 1),
-        "leads_by_date": [{'date': k, 'count': v} for k, v in leads_by_date.items()],
-        "leads_by_source": [{'name': k, 'value': v} for k, v in leads_by_source.items()],
-"recent_campaigns": recent_campaigns
-  }
-
-# Include router
+        "emails_sent": stats['emails_sent'],
+        "open_rate": stats['open_rate'],
+        "reply_rate": stats['reply_rate'],
+        "leads_by_date": [{'date': d, 'count': stats['by_date'].get(d, 0)} for d in dates],
+        "leads_by_source": stats['by_source'],
+        "recent_campaigns": recent_campaigns
+    }
+    analytics_cache.set((user_id, cache_name), data)
+    return data
 
-  
 @api_router.get("/analytics/summary")
-async def get_analytics_summary(current_user: dict = Depends(get_current_user)):
+async def get_analytics_summary(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    etag: str = Depends(user_data_etag),
+    current_user: dict = Depends(get_current_user)
+):
     user_id = current_user['user_id']
-    now_ts = datetime.now(timezone.utc).timestamp()
-    cache = analytics_cache["summary"]
-    if cache["data"] is not None and now_ts - cache["timestamp"] < ANALYTICS_CACHE_TTL:
-        return cache["data"]
-    total_leads = await db.leads.count_documents({"user_id": user_id})
-    campaigns = await db.campaigns.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-    total_emails_sent = sum(c.get("sent_count", 0) for c in campaigns)
-    total_opens = sum(c.get("opened_count", 0) for c in campaigns)
-    total_replies = sum(c.get("replied_count", 0) for c in campaigns)
-    open_rate = (total_opens / total_emails_sent * 100) if total_emails_sent > 0 else 0
-    reply_rate = (total_replies / total_emails_sent * 100) if total_emails_sent > 0 else 0
+    cache_name = f"summary:{date_from}:{date_to}:{etag}"
+    cached = analytics_cache.get((user_id, cache_name))
+    if cached is not None:
+        return cached
+    start, end, first_day, last_day = analytics_range(date_from, date_to)
+    stats, total_campaigns = await asyncio.gather(
+        rollup_stats(user_id, datetime.now(timezone.utc).strftime('%Y-%m-%d'), first_day, last_day),
+        db.campaigns.count_documents({"user_id": user_id, **date_range_filter("created_at", start, end)}),
+    )
     data = {
-        "total_leads": total_leads,
-        "total_campaigns": len(campaigns),
-        "open_rate": round(open_rate, 1),
-        "reply_rate": round(reply_rate, 1)
+        "total_leads": stats['total_leads'],
+        "total_campaigns": total_campaigns,
+        "open_rate": stats['open_rate'],
+        "reply_rate": stats['reply_rate']
     }
-    analytics_cache["summary"] = {"data": data, "timestamp": now_ts}
+    analytics_cache.set((user_id, cache_name), data)
     return data
 
 @api_router.get("/analytics/sources")
-async def get_analytics_sources(current_user: dict = Depends(get_current_user)):
+async def get_analytics_sources(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    etag: str = Depends(user_data_etag),
+    current_user: dict = Depends(get_current_user)
+):
     user_id = current_user['user_id']
-    now_ts = datetime.now(timezone.utc).timestamp()
-    cache = analytics_cache["sources"]
-    if cache["data"] is not None and now_ts - cache["timestamp"] < ANALYTICS_CACHE_TTL:
-        return cache["data"]
-    all_leads = await db.leads.find({"user_id": user_id}, {"_id": 0, "source": 1}).to_list(10000)
-    leads_by_source = {}
-    for lead in all_leads:
-        source = lead.get('source', 'Unknown')
-        leads_by_source[source] = leads_by_source.get(source, 0) + 1
+    cache_name = f"sources:{date_from}:{date_to}:{etag}"
+    cached = analytics_cache.get((user_id, cache_name))
+    if cached is not None:
+        return cached
+    _, _, first_day, last_day = analytics_range(date_from, date_to)
+    stats = await rollup_stats(user_id, datetime.now(timezone.utc).strftime('%Y-%m-%d'), first_day, last_day)
     data = {
-        "leads_by_source": [{"name": k, "value": v} for k, v in leads_by_source.items()]
+        "leads_by_source": stats['by_source']
     }
-    analytics_cache["sources"] = {"data": data, "timestamp": now_ts}
+    analytics_cache.set((user_id, cache_name), data)
     return data
 
 @api_router.get("/analytics/engagement")
-async def get_analytics_engagement(current_user: dict = Depends(get_current_user)):
+async def get_analytics_engagement(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    etag: str = Depends(user_data_etag),
+    current_user: dict = Depends(get_current_user)
+):
     user_id = current_user['user_id']
-    now_ts = datetime.now(timezone.utc).timestamp()
-    cache = analytics_cache["engagement"]
-    if cache["data"] is not None and now_ts - cache["timestamp"] < ANALYTICS_CACHE_TTL:
-        return cache["data"]
-    campaigns = await db.campaigns.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-    total_emails_sent = sum(c.get("sent_count", 0) for c in campaigns)
-    total_opens = sum(c.get("opened_count", 0) for c in campaigns)
-    total_replies = sum(c.get("replied_count", 0) for c in campaigns)
-    open_rate = (total_opens / total_emails_sent * 100) if total_emails_sent > 0 else 0
-    reply_rate = (total_replies / total_emails_sent * 100) if total_emails_sent > 0 else 0
+    cache_name = f"engagement:{date_from}:{date_to}:{etag}"
+    cached = analytics_cache.get((user_id, cache_name))
+    if cached is not None:
+        return cached
+    _, _, first_day, last_day = analytics_range(date_from, date_to)
+    stats = await rollup_stats(user_id, datetime.now(timezone.utc).strftime('%Y-%m-%d'), first_day, last_day)
     data = {
-        "emails_sent": total_emails_sent,
-        "open_rate": round(open_rate, 1),
-        "reply_rate": round(reply_rate, 1)
+        "emails_sent": stats['emails_sent'],
+        "open_rate": stats['open_rate'],
+        "reply_rate": stats['reply_rate']
     }
-    analytics_cache["engagement"] = {"data": data, "timestamp": now_ts}
+    analytics_cache.set((user_id, cache_name), data)
     return data
 
   # Global error handlers
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified):
+    return Response(status_code=304, headers=etag_headers(exc.etag))
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
@@ -669,6 +3258,37 @@ async def general_exception_handler(request: Request, exc: Exception):
         content={"success": False, "message": "Internal server error", "data": None},
     )
 
+# ============= ADMIN ROUTES =============
+@api_router.get("/admin/indexes")
+async def get_index_report(current_user: dict = Depends(get_admin_user)):
+    return await index_report()
+
+@api_router.post("/admin/indexes/reconcile")
+async def reconcile_indexes(current_user: dict = Depends(get_admin_user)):
+    return await ensure_indexes()
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_analytics_rollups(user_id: Optional[str] = None, current_user: dict = Depends(get_admin_user)):
+    documents = await rebuild_rollups(user_id)
+    if user_id:
+        await touch_user_data(user_id)
+    else:
+        analytics_cache.clear()
+        await db.users.update_many({}, {"$inc": {"data_version": 1}})
+    return {"rollup_documents": documents}
+
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_admin_user)):
+    return {
+        "analytics": analytics_cache.stats(),
+        "lead_counts": lead_count_cache.stats(),
+        "ai_follow_up": ai_cache_stats(),
+    }
+
+@api_router.get("/admin/password-hashing/stats")
+async def get_password_hashing_stats(current_user: dict = Depends(get_admin_user)):
+    return password_hasher.stats()
+
 # Health check endpoint
 @api_router.get("/health")
 async def health():
@@ -677,6 +3297,7 @@ async def health():
 app.include_router(api_router)
 
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -688,6 +3309,113 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_background_services():
+    llm_error = llm_backend.config_error()
+    if llm_error:
+        logger.error(llm_error)
+    report = await ensure_indexes()
+    for collection_name, changes in report.items():
+        if changes['created'] or changes['rebuilt']:
+            logger.info(f"Indexes on {collection_name}: {changes}")
+    asyncio.create_task(backfill_lead_search_fields())
+    asyncio.create_task(backfill_lead_fingerprints())
+    asyncio.create_task(backfill_lead_job_ids())
+    asyncio.create_task(migrate_dates())
+    # Before anything that applies rollup increments starts
+    await bootstrap_rollups()
+    asyncio.create_task(tracking_buffer.run())
+    if JOB_WORKER_IN_PROCESS:
+        global job_runner
+        job_runner = JobRunner()
+        asyncio.create_task(job_runner.run())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if job_runner is not None:
+        job_runner.stopping = True
+    await tracking_buffer.flush()
     client.close()
+
+# ============= DATE MIGRATION =============
+# Timestamp fields that older releases stored as ISO strings
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "leads": ["created_at", "last_activity"],
+    "scraping_jobs": ["created_at", "completed_at"],
+    "campaigns": ["created_at", "completed_at"],
+    "email_logs": ["sent_at", "opened_at", "clicked_at", "replied_at"],
+    "email_accounts": ["created_at"],
+    "background_jobs": ["created_at", "updated_at", "lease_expires_at"],
+    "lead_operations": ["created_at", "completed_at"],
+    "campaign_personalisations": ["created_at"],
+}
+MIGRATION_BATCH_SIZE = 1000
+
+async def migrate_dates(batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+    """Converts ISO-string timestamps to BSON dates, batch_size documents per bulk write.
+
+    Safe to run while the API is serving and to re-run: each update only applies if the
+    field still holds the string that was read, so concurrent writes are never undone.
+    Values that do not parse are left as they are."""
+    report = {}
+    for collection_name, fields in DATE_FIELDS.items():
+        collection = db[collection_name]
+        has_strings = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        converted = 0
+        last_id = None
+        while True:
+            query = {"$and": [has_strings, {"_id": {"$gt": last_id}}]} if last_id is not None else has_strings
+            docs = await collection.find(
+                query, {field: 1 for field in fields}
+            ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            last_id = docs[-1]['_id']
+            ops = []
+            for doc in docs:
+                for field in fields:
+                    value = doc.get(field)
+                    if not isinstance(value, str):
+                        continue
+                    try:
+                        ops.append(UpdateOne({"_id": doc['_id'], field: value}, {"$set": {field: parse_timestamp(value)}}))
+                    except ValueError:
+                        logging.warning(f"{collection_name} {doc['_id']}: {field} is not a timestamp: {value!r}")
+            if ops:
+                converted += (await collection.bulk_write(ops, ordered=False)).modified_count
+        report[collection_name] = converted
+        if converted:
+            logging.info(f"Converted {converted} {collection_name} timestamps to dates")
+    return report
+
+# ============= WORKER ENTRYPOINT =============
+async def run_date_migration(batch_size: int):
+    """One-off command: python server.py migrate-dates [--batch-size N]"""
+    try:
+        report = await migrate_dates(batch_size)
+        print(json.dumps(report, indent=2))
+    finally:
+        client.close()
+
+async def run_job_worker(concurrency: int):
+    """Standalone worker process: python server.py worker [--concurrency N]"""
+    flusher = asyncio.create_task(tracking_buffer.run())
+    try:
+        await JobRunner(concurrency).run()
+    finally:
+        flusher.cancel()
+        await tracking_buffer.flush()
+        client.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="LeadFlow Genius background job worker and maintenance commands")
+    parser.add_argument("command", choices=["worker", "migrate-dates"])
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    args = parser.parse_args()
+    if args.command == "migrate-dates":
+        asyncio.run(run_date_migration(args.batch_size))
+    else:
+        asyncio.run(run_job_worker(args.concurrency))
@@ -28,6 +28,7 @@ const CRMPage = () => {
     source: '',
   });
   const [page, setPage] = useState(0);
+  const [cursors, setCursors] = useState([null]);
   const [editingLead, setEditingLead] = useState(null);
   const limit = 20;
 
@@ -38,8 +39,9 @@ const CRMPage = () => {
   const fetchLeads = async () => {
     try {
       const params = new URLSearchParams({
-        skip: page * limit,
         limit,
+        total: page === 0 ? 'exact' : 'cached',
+        ...(cursors[page] && { cursor: cursors[page] }),
         ...(filters.status && { status: filters.status }),
         ...(filters.source && { source: filters.source }),
         ...(filters.search && { search: filters.search }),
@@ -48,6 +50,7 @@ const CRMPage = () => {
       const response = await axios.get(`${API}/leads?${params}`);
       setLeads(response.data.leads);
       setTotal(response.data.total);
+      setCursors((prev) => [...prev.slice(0, page + 1), response.data.next_cursor]);
     } catch (error) {
       toast.error('Failed to load leads');
     } finally {
@@ -55,6 +58,12 @@ const CRMPage = () => {
     }
   };
 
+  const updateFilters = (changes) => {
+    setFilters({ ...filters, ...changes });
+    setPage(0);
+    setCursors([null]);
+  };
+
   const handleSelectAll = (checked) => {
     if (checked) {
       setSelectedLeads(leads.map((l) => l.id));
@@ -84,6 +93,37 @@ const CRMPage = () => {
     }
   };
 
+  const waitForOperation = async (operationId) => {
+    while (true) {
+      const response = await axios.get(`${API}/leads/bulk/${operationId}`);
+      if (['completed', 'failed'].includes(response.data.status)) {
+        return response.data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
+  const handleBulkStatus = async (status) => {
+    if (selectedLeads.length === 0) return;
+
+    try {
+      const response = await axios.post(`${API}/leads/bulk`, {
+        action: 'set_status',
+        lead_ids: selectedLeads,
+        status,
+      });
+      const operation = await waitForOperation(response.data.id);
+      if (operation.status === 'failed') {
+        throw new Error('Bulk status update failed');
+      }
+      toast.success(`Updated ${operation.changed} leads`);
+      setSelectedLeads([]);
+      fetchLeads();
+    } catch (error) {
+      toast.error('Failed to update status');
+    }
+  };
+
   const updateLeadStatus = async (leadId, status) => {
     try {
       await axios.put(`${API}/leads/${leadId}`, { status });
@@ -127,16 +167,16 @@ const CRMPage = () => {
               <div className="relative">
                 <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 text-gray-400 w-5 h-5" />
                 <Input
-                  placeholder="Search by business name or email..."
+                  placeholder="Search by name, email, phone, address or tag..."
                   className="pl-10 rounded-xl"
                   value={filters.search}
-                  onChange={(e) => setFilters({ ...filters, search: e.target.value })}
+                  onChange={(e) => updateFilters({ search: e.target.value })}
                   data-testid="crm-search-input"
                 />
               </div>
             </div>
 
-            <Select value={filters.status} onValueChange={(value) => setFilters({ ...filters, status: value })}>
+            <Select value={filters.status} onValueChange={(value) => updateFilters({ status: value })}>
               <SelectTrigger className="w-full md:w-48 rounded-xl" data-testid="status-filter">
                 <SelectValue placeholder="All Statuses" />
               </SelectTrigger>
@@ -149,6 +189,20 @@ const CRMPage = () => {
               </SelectContent>
             </Select>
 
+            {selectedLeads.length > 0 && (
+              <Select value="" onValueChange={handleBulkStatus}>
+                <SelectTrigger className="w-full md:w-48 rounded-xl" data-testid="bulk-status-select">
+                  <SelectValue placeholder={`Set status (${selectedLeads.length})`} />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="New">New</SelectItem>
+                  <SelectItem value="Emailed">Emailed</SelectItem>
+                  <SelectItem value="Follow-up">Follow-up</SelectItem>
+                  <SelectItem value="Replied">Replied</SelectItem>
+                </SelectContent>
+              </Select>
+            )}
+
             {selectedLeads.length > 0 && (
               <Button variant="destructive" className="rounded-xl" onClick={handleBulkDelete} data-testid="bulk-delete-button">
                 <Trash2 className="w-4 h-4 mr-2" />
@@ -284,7 +338,7 @@ const CRMPage = () => {
                   variant="outline"
                   size="sm"
                   className="rounded-xl"
-                  disabled={(page + 1) * limit >= total}
+                  disabled={!cursors[page + 1]}
                   onClick={() => setPage(page + 1)}
                   data-testid="next-page-button"
                 >
@@ -81,16 +81,51 @@ const EmailCampaigns = () => {
 
   const handleGenerateWithAI = async () => {
     try {
-      const response = await axios.post(`${API}/ai/generate-follow-up`, {
-        lead_name: 'Business Owner',
-        business_name: 'Sample Business',
-        tone: 'Friendly',
-      });
-      setFormData({
-        ...formData,
-        subject: response.data.subject,
-        body: response.data.body,
+      const response = await fetch(`${API}/ai/generate-follow-up/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${localStorage.getItem('token')}`,
+        },
+        body: JSON.stringify({
+          lead_name: 'Business Owner',
+          business_name: 'Sample Business',
+          tone: 'Friendly',
+        }),
       });
+      if (!response.ok) {
+        throw new Error(`Generation failed with status ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      setFormData((form) => ({ ...form, subject: '', body: '' }));
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+          const data = event
+            .split('\n')
+            .filter((line) => line.startsWith('data:'))
+            .map((line) => line.slice(5).trim())
+            .join('');
+          if (!data) continue;
+
+          const message = JSON.parse(data);
+          if (message.type === 'subject') {
+            setFormData((form) => ({ ...form, subject: message.subject }));
+          } else if (message.type === 'body') {
+            setFormData((form) => ({ ...form, body: form.body + message.delta }));
+          } else if (message.type === 'done') {
+            setFormData((form) => ({ ...form, subject: message.subject, body: message.body }));
+          }
+        }
+      }
       toast.success('Email generated with AI!');
     } catch (error) {
       toast.error('Failed to generate email');
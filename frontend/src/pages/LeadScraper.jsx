@@ -28,29 +28,58 @@ const LeadScraper = () => {
 
   useEffect(() => {
     if (currentJob?.id) {
-      const interval = setInterval(() => fetchJobStatus(), 1000);
-      return () => clearInterval(interval);
+      const controller = new AbortController();
+      streamJobProgress(currentJob.id, controller.signal);
+      return () => controller.abort();
     }
-  }, [currentJob]);
+  }, [currentJob?.id]);
 
-  const fetchJobStatus = async () => {
+  const streamJobProgress = async (jobId, signal) => {
     try {
-      const response = await axios.get(`${API}/scraper/status/${currentJob.id}`);
-      setCurrentJob(response.data);
+      const response = await fetch(`${API}/scraper/jobs/${jobId}/events`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+        signal,
+      });
+      if (!response.ok) {
+        throw new Error(`Progress stream failed with status ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
 
-      if (response.data.status === 'completed') {
-        fetchLeads(response.data.results);
+        for (const event of events) {
+          const data = event
+            .split('\n')
+            .filter((line) => line.startsWith('data:'))
+            .map((line) => line.slice(5).trim())
+            .join('');
+          if (!data) continue;
+
+          const delta = JSON.parse(data);
+          setCurrentJob((job) => ({ ...job, ...delta }));
+          if (delta.status === 'completed') {
+            fetchLeads(jobId);
+          }
+        }
       }
     } catch (error) {
-      console.error('Error fetching job status:', error);
+      if (error.name !== 'AbortError') {
+        console.error('Error streaming job progress:', error);
+      }
     }
   };
 
-  const fetchLeads = async (leadIds) => {
+  const fetchLeads = async (jobId) => {
     try {
-      const promises = leadIds.slice(0, 20).map((id) => axios.get(`${API}/leads/${id}`));
-      const responses = await Promise.all(promises);
-      setLeads(responses.map((r) => r.data));
+      const response = await axios.get(`${API}/scraper/jobs/${jobId}/results?limit=20`);
+      setLeads(response.data.leads);
     } catch (error) {
       console.error('Error fetching leads:', error);
     }
@@ -250,6 +279,9 @@ const LeadScraper = () => {
             <Progress value={currentJob.progress || 0} className="h-3" />
             <p className="text-sm text-gray-500 mt-2">
               Status: <span className="font-semibold">{currentJob.status}</span>
+              {currentJob.duplicate_leads > 0 && (
+                <span className="ml-2">({currentJob.duplicate_leads} duplicates merged)</span>
+              )}
             </p>
           </CardContent>
         </Card>
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { motion } from 'framer-motion';
 import {
@@ -35,30 +35,7 @@ const SettingsPage = () => {
   const user = JSON.parse(localStorage.getItem('user') || '{}');
 
   // Email Accounts State
-  const [emailAccounts, setEmailAccounts] = useState([
-    {
-      id: 1,
-      email: 'primary@gmail.com',
-      type: 'Gmail',
-      status: 'Active',
-      daily_limit: 200,
-      sent_today: 45,
-      errors_today: 2,
-      is_primary: true,
-      sender_name: 'LeadFlow Team',
-    },
-    {
-      id: 2,
-      email: 'support@company.com',
-      type: 'SMTP',
-      status: 'Active',
-      daily_limit: 150,
-      sent_today: 23,
-      errors_today: 0,
-      is_primary: false,
-      sender_name: 'Support Team',
-    },
-  ]);
+  const [emailAccounts, setEmailAccounts] = useState([]);
 
   const [showGmailDialog, setShowGmailDialog] = useState(false);
   const [showSMTPDialog, setShowSMTPDialog] = useState(false);
@@ -91,22 +68,36 @@ const SettingsPage = () => {
     enable_fallback: true,
   });
 
-  const handleConnectGmail = () => {
+  useEffect(() => {
+    fetchEmailAccounts();
+  }, []);
+
+  const withAccountDefaults = (account) => ({ errors_today: 0, ...account });
+
+  const fetchEmailAccounts = async () => {
+    try {
+      const response = await axios.get(`${API}/settings/email-accounts`);
+      setEmailAccounts(response.data.map(withAccountDefaults));
+    } catch (error) {
+      toast.error('Failed to load email accounts');
+    }
+  };
+
+  const handleConnectGmail = async () => {
     // Simulate OAuth2 flow
     toast.success('Gmail OAuth flow initiated! (Simulated in MVP)');
-    const newAccount = {
-      id: Date.now(),
-      email: 'newgmail@gmail.com',
-      type: 'Gmail',
-      status: 'Active',
-      daily_limit: 200,
-      sent_today: 0,
-      errors_today: 0,
-      is_primary: false,
-      sender_name: 'LeadFlow',
-    };
-    setEmailAccounts([...emailAccounts, newAccount]);
-    setShowGmailDialog(false);
+    try {
+      const response = await axios.post(`${API}/settings/email-accounts`, {
+        email: 'newgmail@gmail.com',
+        type: 'Gmail',
+        sender_name: 'LeadFlow',
+        daily_limit: 200,
+      });
+      setEmailAccounts([...emailAccounts, withAccountDefaults(response.data)]);
+      setShowGmailDialog(false);
+    } catch (error) {
+      toast.error('Failed to connect Gmail account');
+    }
   };
 
   const handleTestSMTPConnection = async () => {
@@ -117,28 +108,30 @@ const SettingsPage = () => {
     }, 1500);
   };
 
-  const handleSaveSMTPAccount = () => {
+  const handleSaveSMTPAccount = async () => {
     if (!smtpForm.email || !smtpForm.host || !smtpForm.username || !smtpForm.password) {
       toast.error('Please fill all required fields');
       return;
     }
 
-    const newAccount = {
-      id: Date.now(),
-      email: smtpForm.email,
-      type: 'SMTP',
-      status: 'Active',
-      daily_limit: smtpForm.daily_limit,
-      sent_today: 0,
-      errors_today: 0,
-      is_primary: false,
-      sender_name: smtpForm.sender_name,
-      smtp_config: {
-        host: smtpForm.host,
-        port: smtpForm.port,
-        username: smtpForm.username,
-      },
-    };
+    let newAccount;
+    try {
+      const response = await axios.post(`${API}/settings/email-accounts`, {
+        email: smtpForm.email,
+        type: 'SMTP',
+        sender_name: smtpForm.sender_name,
+        daily_limit: parseInt(smtpForm.daily_limit),
+        smtp_config: {
+          host: smtpForm.host,
+          port: smtpForm.port,
+          username: smtpForm.username,
+        },
+      });
+      newAccount = withAccountDefaults(response.data);
+    } catch (error) {
+      toast.error('Failed to add SMTP account');
+      return;
+    }
 
     setEmailAccounts([...emailAccounts, newAccount]);
     setShowSMTPDialog(false);
@@ -154,7 +147,13 @@ const SettingsPage = () => {
     toast.success('SMTP account added successfully!');
   };
 
-  const handleSetPrimary = (accountId) => {
+  const handleSetPrimary = async (accountId) => {
+    try {
+      await axios.put(`${API}/settings/email-accounts/${accountId}`, { is_primary: true });
+    } catch (error) {
+      toast.error('Failed to update primary account');
+      return;
+    }
     setEmailAccounts(
       emailAccounts.map((acc) => ({
         ...acc,
@@ -164,26 +163,52 @@ const SettingsPage = () => {
     toast.success('Primary email account updated!');
   };
 
-  const handleDeactivate = (accountId) => {
-    setEmailAccounts(
-      emailAccounts.map((acc) =>
-        acc.id === accountId ? { ...acc, status: acc.status === 'Active' ? 'Inactive' : 'Active' } : acc
-      )
-    );
+  const handleDeactivate = async (accountId) => {
+    const account = emailAccounts.find((acc) => acc.id === accountId);
+    const status = account.status === 'Active' ? 'Inactive' : 'Active';
+    try {
+      await axios.put(`${API}/settings/email-accounts/${accountId}`, { status });
+    } catch (error) {
+      toast.error('Failed to update account status');
+      return;
+    }
+    setEmailAccounts(emailAccounts.map((acc) => (acc.id === accountId ? { ...acc, status } : acc)));
     toast.success('Account status updated!');
   };
 
-  const handleDeleteAccount = (accountId) => {
+  const handleDeleteAccount = async (accountId) => {
     if (emailAccounts.length === 1) {
       toast.error('Cannot delete the last email account');
       return;
     }
+    try {
+      await axios.delete(`${API}/settings/email-accounts/${accountId}`);
+    } catch (error) {
+      toast.error('Failed to delete email account');
+      return;
+    }
     setEmailAccounts(emailAccounts.filter((acc) => acc.id !== accountId));
     toast.success('Email account deleted');
   };
 
-  const handleExportLeads = () => {
+  const handleExportLeads = async (format) => {
     toast.success('Exporting leads... Download will start shortly');
+    try {
+      const response = await fetch(`${API}/leads/export?format=${format}`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+      });
+      if (!response.ok) {
+        throw new Error(`Export failed with status ${response.status}`);
+      }
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `leads.${format}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error('Failed to export leads');
+    }
   };
 
   const handleExportEmails = () => {
@@ -679,11 +704,11 @@ const SettingsPage = () => {
                 <h4 className="font-semibold text-blue-900 mb-2">Export Lead History</h4>
                 <p className="text-sm text-blue-700 mb-3">Download all your scraped leads as CSV or JSON</p>
                 <div className="flex gap-2">
-                  <Button variant="outline" className="rounded-xl" onClick={handleExportLeads}>
+                  <Button variant="outline" className="rounded-xl" onClick={() => handleExportLeads('csv')}>
                     <Download className="w-4 h-4 mr-2" />
                     Export CSV
                   </Button>
-                  <Button variant="outline" className="rounded-xl" onClick={handleExportLeads}>
+                  <Button variant="outline" className="rounded-xl" onClick={() => handleExportLeads('ndjson')}>
                     <Download className="w-4 h-4 mr-2" />
                     Export JSON
                   </Button>
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# server.py reads these at import time; the unit tests never talk to MongoDB or an LLM
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'leadflow_test')
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
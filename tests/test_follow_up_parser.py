@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from server import FollowUpStreamParser, parse_follow_up
+
+REPLIES = [
+    "SUBJECT: Quick follow-up\nBODY: Hi Sam,\n\nJust checking in.\n\nBest regards",
+    "SUBJECT: Quick follow-up\r\nBODY: Hi Sam,\r\n\r\nJust checking in.\r\n",
+    "  \n\tSUBJECT: Leading whitespace\nBODY: Body text",
+    "BODY: Body first\nmore body\nSUBJECT: Subject after the body\nlast line",
+    "SUBJECT: One\nSUBJECT: Two\nBODY: x\nBODY: Started over\nagain",
+    "Preamble the parser ignores\nSUBJECT: S\nBODY:\n\nBody on the next line  ",
+    "SUBJECT: S\nBODY: aBODY:b BOBODY:DY:",
+    "SUBJECT: no body",
+    "",
+]
+
+def feed_all(chunks):
+    parser = FollowUpStreamParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.finish())
+    return parser, events
+
+def random_chunks(text, rng):
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 7)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+@pytest.mark.parametrize("reply", REPLIES)
+def test_result_matches_parse_follow_up_for_any_chunking(reply):
+    rng = random.Random(reply)
+    for _ in range(200):
+        parser, _ = feed_all(random_chunks(reply, rng))
+        assert parser.result() == parse_follow_up(reply)
+
+@pytest.mark.parametrize("reply", [r for r in REPLIES if r.count("BODY:") <= 1])
+def test_body_deltas_add_up_to_the_body(reply):
+    rng = random.Random(reply)
+    expected = parse_follow_up(reply)['body']
+    for _ in range(200):
+        parser, events = feed_all(random_chunks(reply, rng))
+        body = ""
+        for kind, text in events:
+            if kind == "body":
+                body += text
+                assert expected.startswith(body)
+        assert body == expected
+
+def test_subject_is_sent_once_its_line_is_complete():
+    parser = FollowUpStreamParser()
+    assert parser.feed("SUBJECT: Hel") == []
+    assert parser.feed("lo\nBO") == [("subject", "Hello")]
+    assert parser.feed("DY: Hi") == [("body", "Hi")]
+
+def test_body_is_held_back_while_a_line_could_still_be_a_marker():
+    parser = FollowUpStreamParser()
+    parser.feed("BODY: first line\nSUBJ")
+    assert parser.sent_body == "first line"
+    assert parser.feed("ECT: late subject\n") == [("subject", "late subject")]
+    assert parser.feed("second") == [("body", "\nsecond")]
+
+def test_crlf_reply_is_split_like_parse_follow_up():
+    # The BODY: line is stripped, the lines after it keep their carriage returns
+    reply = "SUBJECT: Hi\r\nBODY: a\r\nb\r\nc"
+    parser, _ = feed_all(random_chunks(reply, random.Random(0)))
+    assert parser.result() == parse_follow_up(reply) == {"subject": "Hi", "body": "a\nb\r\nc"}
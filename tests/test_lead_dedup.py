@@ -0,0 +1,38 @@
+from server import build_lead_doc, lead_fingerprint, lead_upsert_op, website_host
+
+def test_fingerprint_ignores_formatting_of_phone_website_and_email():
+    a = {"phone": "+1 (555) 010-2030", "website": "https://www.acme.com/contact", "email": "Hi@Acme.com "}
+    b = {"phone": "555.010.2030", "website": "acme.com", "email": "hi@acme.com"}
+    assert lead_fingerprint(a) == lead_fingerprint(b)
+
+def test_fingerprint_falls_back_to_name_and_address():
+    a = {"business_name": "Joe's Café", "address": "1 Main St."}
+    b = {"business_name": "joe s café", "address": "1  main st"}
+    assert lead_fingerprint(a) == lead_fingerprint(b)
+    assert lead_fingerprint(a) != lead_fingerprint({"business_name": "Joe's Café", "address": "2 Main St"})
+
+def test_contact_details_take_precedence_over_the_name():
+    a = {"business_name": "Acme", "phone": "5550102030"}
+    b = {"business_name": "Acme Inc", "phone": "5550102030"}
+    assert lead_fingerprint(a) == lead_fingerprint(b)
+
+def test_website_host():
+    assert website_host("HTTP://WWW.Example.com:8080/x") == "example.com"
+    assert website_host("example.com/path") == "example.com"
+    assert website_host("") == "" and website_host(None) == ""
+
+def test_upsert_merges_ratings_and_records_the_job():
+    doc = build_lead_doc("u", {"business_name": "Acme", "rating": 4.5, "review_count": 10}, "job-2")
+    op = lead_upsert_op(doc)
+    assert op._filter == {"user_id": "u", "fingerprint": doc['fingerprint']}
+    update = op._doc
+    assert update["$set"] == {"rating": 4.5, "review_count": 10}
+    assert update["$addToSet"] == {"job_ids": "job-2"}
+    assert update["$setOnInsert"]["job_id"] == "job-2"
+    assert not {"rating", "review_count", "job_ids", "fingerprint", "user_id"} & set(update["$setOnInsert"])
+
+def test_upsert_without_a_job_inserts_an_empty_job_list():
+    doc = build_lead_doc("u", {"business_name": "Acme"})
+    update = lead_upsert_op(doc)._doc
+    assert "$addToSet" not in update
+    assert update["$setOnInsert"]["job_ids"] == []
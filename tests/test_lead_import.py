@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from server import import_lead_doc, iter_import_rows, iter_text_lines
+
+async def async_iter(items):
+    for item in items:
+        yield item
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+def read_rows(body, format, chunk_size=7):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    return asyncio.run(collect(iter_import_rows(iter_text_lines(async_iter(chunks)), format)))
+
+def test_text_lines_survive_split_multibyte_characters_and_bom():
+    body = "﻿name\r\nCafé Zoë\r\nlast".encode("utf-8")
+    for size in range(1, 6):
+        chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        assert asyncio.run(collect(iter_text_lines(async_iter(chunks)))) == ["name", "Café Zoë", "last"]
+
+def test_csv_rows_are_keyed_by_the_header_and_quoted_fields_may_span_lines():
+    body = b'Business_Name,Address\nAcme,"1 Main St\nSuite 2"\n\n"Bob ""The"" Baker",Elm\n'
+    assert read_rows(body, "csv") == [
+        (1, {"business_name": "Acme", "address": "1 Main St\nSuite 2"}),
+        (2, {"business_name": 'Bob "The" Baker', "address": "Elm"}),
+    ]
+
+def test_csv_unterminated_quote_is_reported():
+    rows = read_rows(b'business_name\n"Acme\n', "csv")
+    assert len(rows) == 1 and isinstance(rows[0][1], ValueError)
+
+def test_ndjson_reports_bad_lines_and_keeps_going():
+    rows = read_rows(b'{"business_name": "Acme"}\nnot json\n[1]\n\n{"business_name": "Bob"}\n', "ndjson")
+    assert [number for number, _ in rows] == [1, 2, 3, 4]
+    assert rows[0][1] == {"business_name": "Acme"}
+    assert isinstance(rows[1][1], ValueError) and isinstance(rows[2][1], ValueError)
+    assert rows[3][1] == {"business_name": "Bob"}
+
+def test_imported_tags_are_searchable():
+    doc = import_lead_doc("u", {"Business_Name": "Acme", "tags": "vip; hotel"})
+    assert doc['tags'] == ["vip", "hotel"]
+    assert {"acme", "vip", "hotel"} <= set(doc['search_words'])
+    assert "ho" in doc['search_terms']
+
+def test_import_rejects_rows_without_a_business_name():
+    with pytest.raises(ValueError):
+        import_lead_doc("u", {"email": "a@b.co"})